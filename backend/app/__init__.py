@@ -1,7 +1,13 @@
 import os
+import logging
 from flask import Flask
 from config import Config
-from app.extensions import mongo
+from app.extensions import mongo, sock
+from app.indexes import ensure_indexes
+from app.archiver import SessionArchiver
+from app.llm.prompts import load_encoding
+
+logger = logging.getLogger(__name__)
 
 def create_app(test_config=None):
     # Initialize logging first
@@ -16,6 +22,19 @@ def create_app(test_config=None):
 
     # Initialize MongoDB
     mongo.init_app(app)
+    try:
+        ensure_indexes(mongo.db)
+    except Exception as e:
+        # Don't refuse to start if Mongo is briefly unavailable; indexes are retried on next start
+        logger.warning(f"Could not ensure MongoDB indexes: {str(e)}")
+    sock.init_app(app)
+
+    # Load the tokenizer now, so no request waits for it to be fetched
+    load_encoding()
+
+    # Move ended and idle sessions out of the hot collection in the background
+    if app.config.get('SESSION_ARCHIVER_ENABLED'):
+        SessionArchiver(mongo.db).start()
 
     # Ensure instance folder exists
     try:
@@ -24,11 +43,14 @@ def create_app(test_config=None):
         pass
 
     # Register blueprints
-    from app.routes import user_bp, scene_bp, conversation_bp, learning_bp, config_bp
+    from app.routes import user_bp, scene_bp, conversation_bp, learning_bp, config_bp, metrics_bp, conversation_socket_bp, tts_bp
     app.register_blueprint(user_bp)
     app.register_blueprint(scene_bp)
     app.register_blueprint(conversation_bp)
     app.register_blueprint(learning_bp)
     app.register_blueprint(config_bp)
+    app.register_blueprint(metrics_bp)
+    app.register_blueprint(conversation_socket_bp)
+    app.register_blueprint(tts_bp)
 
     return app 
\ No newline at end of file
@@ -0,0 +1,188 @@
+import json
+import threading
+import zlib
+import logging
+from datetime import datetime, timedelta
+from typing import List, Optional
+from bson import Binary
+from pymongo import ReturnDocument
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Session fields copied into the archive document as-is
+ARCHIVED_FIELDS = (
+    'user_uid', 'scene_id', 'started_at', 'ended_at', 'last_activity_at',
+    'message_count', 'summary', 'learning_points'
+)
+
+
+def compress_messages(messages: List[dict]) -> Binary:
+    """Pack messages as zlib-compressed JSON rows of [role, text, timestamp]"""
+    rows = [
+        [msg['role'], msg['text'], msg['timestamp'].isoformat() if msg.get('timestamp') else None]
+        for msg in messages
+    ]
+    return Binary(zlib.compress(json.dumps(rows, ensure_ascii=False).encode('utf-8'), 9))
+
+
+def decompress_messages(blob: bytes) -> List[dict]:
+    """Inverse of compress_messages"""
+    return [
+        {'role': role, 'text': text, 'timestamp': datetime.fromisoformat(timestamp) if timestamp else None}
+        for role, text, timestamp in json.loads(zlib.decompress(blob).decode('utf-8'))
+    ]
+
+
+def archive_query(now: datetime, idle_seconds: float = None, ended_grace_seconds: float = None) -> dict:
+    """Sessions due for archiving: ended a while ago, or idle for too long"""
+    idle_cutoff = now - timedelta(seconds=Config.SESSION_IDLE_SECONDS if idle_seconds is None else idle_seconds)
+    ended_cutoff = now - timedelta(seconds=Config.SESSION_ENDED_GRACE_SECONDS if ended_grace_seconds is None else ended_grace_seconds)
+    return {
+        # Sessions still holding an embedded messages array haven't been migrated to
+        # buckets yet (scripts/migrate_message_buckets.py); leave them alone
+        'messages': {'$exists': False},
+        '$or': [
+            {'ended_at': {'$ne': None, '$lt': ended_cutoff}},
+            {'last_activity_at': {'$lt': idle_cutoff}},
+            # Sessions created before last_activity_at was tracked
+            {'last_activity_at': {'$exists': False}, 'started_at': {'$lt': idle_cutoff}}
+        ]
+    }
+
+
+def claim_session(db, session_id, now: datetime, idle_seconds: float = None,
+                  ended_grace_seconds: float = None) -> Optional[dict]:
+    """
+    Mark a session as being archived by this pass if it is still due (see archive_query)
+    and no other pass holds an unexpired claim on it. Returns the claimed session, or None.
+    """
+    return db.conversation_sessions.find_one_and_update(
+        {
+            '_id': session_id,
+            '$and': [
+                archive_query(now, idle_seconds, ended_grace_seconds),
+                {'$or': [{'archiving_until': None}, {'archiving_until': {'$lt': now}}]}
+            ]
+        },
+        {'$set': {'archiving_until': now + timedelta(seconds=Config.SESSION_ARCHIVE_CLAIM_SECONDS)}},
+        projection={field: 1 for field in ARCHIVED_FIELDS + ('archiving_until',)},
+        return_document=ReturnDocument.AFTER
+    )
+
+
+def release_claim(db, session: dict):
+    db.conversation_sessions.update_one(
+        {'_id': session['_id'], 'archiving_until': session['archiving_until']},
+        {'$unset': {'archiving_until': ''}}
+    )
+
+
+def archive_session(db, session_id, now: datetime = None, idle_seconds: float = None,
+                    ended_grace_seconds: float = None) -> bool:
+    """
+    Move one session and its message buckets into conversation_archive.
+
+    The session is claimed first, and only while it is still due, so concurrent passes
+    (several app processes, or the script from cron) never archive it twice and a
+    session that became active again since it was selected is left alone. The archive
+    document is written before the session is deleted, and the delete only goes
+    through if no message arrived in the meantime; a session that came back to life
+    is left in place and its archive copy removed. Returns whether it was archived.
+    """
+    now = now or datetime.utcnow()
+    session = claim_session(db, session_id, now, idle_seconds, ended_grace_seconds)
+    if session is None:
+        return False
+
+    buckets = db.message_buckets.find({'session_id': session_id}, {'messages': 1}, sort=[('seq', 1)])
+    messages = sorted((msg for bucket in buckets for msg in bucket['messages']), key=lambda msg: msg['index'])
+    if len(messages) < (session.get('message_count') or 0):
+        # append_message reserves the index before pushing the message; one is in flight
+        release_claim(db, session)
+        return False
+
+    archive = {field: session.get(field) for field in ARCHIVED_FIELDS}
+    archive.update({
+        '_id': session_id,
+        'messages_z': compress_messages(messages),
+        'archived_at': now,
+        'expires_at': now + timedelta(days=Config.SESSION_ARCHIVE_RETENTION_DAYS)
+    })
+    db.conversation_archive.replace_one({'_id': session_id}, archive, upsert=True)
+
+    deleted = db.conversation_sessions.delete_one({
+        '_id': session_id,
+        'message_count': session.get('message_count'),
+        'last_activity_at': session.get('last_activity_at'),
+        'archiving_until': session['archiving_until']
+    })
+    if deleted.deleted_count == 0:
+        current = db.conversation_sessions.find_one({'_id': session_id}, {'message_count': 1, 'last_activity_at': 1})
+        if current is not None and (
+            (current.get('message_count') or 0) > (session.get('message_count') or 0)
+            or current.get('last_activity_at') != session.get('last_activity_at')
+        ):
+            # The session got new messages while it was being archived: keep it live
+            db.conversation_archive.delete_one({'_id': session_id})
+            release_claim(db, session)
+        return False
+    db.message_buckets.delete_many({'session_id': session_id})
+    return True
+
+
+def archive_inactive_sessions(db, now: datetime = None, limit: int = None, idle_seconds: float = None,
+                              ended_grace_seconds: float = None) -> int:
+    """Archive every session that is due, up to limit; returns how many were archived"""
+    now = now or datetime.utcnow()
+    sessions = db.conversation_sessions.find(
+        archive_query(now, idle_seconds, ended_grace_seconds), {'_id': 1}, limit=limit or 0
+    )
+    archived = 0
+    for session in sessions:
+        try:
+            if archive_session(db, session['_id'], now, idle_seconds, ended_grace_seconds):
+                archived += 1
+        except Exception as e:
+            logger.error(f"Failed to archive session {session['_id']}: {str(e)}")
+    if archived:
+        logger.info(f"Archived {archived} inactive sessions")
+    return archived
+
+
+def load_archived_session(db, session_id) -> Optional[dict]:
+    """An archived session with its messages unpacked, or None"""
+    archive = db.conversation_archive.find_one({'_id': session_id})
+    if archive is None:
+        return None
+    archive['messages'] = decompress_messages(archive.pop('messages_z'))
+    return archive
+
+
+class SessionArchiver:
+    """Daemon thread that archives inactive sessions every interval seconds"""
+
+    def __init__(self, db, interval: float = None, batch_size: int = None):
+        self.db = db
+        self.interval = interval or Config.SESSION_ARCHIVE_INTERVAL
+        self.batch_size = batch_size or Config.SESSION_ARCHIVE_BATCH_SIZE
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='session-archiver', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                # Keep going while there's a backlog, a batch at a time
+                while archive_inactive_sessions(self.db, limit=self.batch_size) == self.batch_size:
+                    if self._stop.is_set():
+                        break
+            except Exception as e:
+                logger.error(f"Session archiver run failed: {str(e)}")
@@ -0,0 +1,130 @@
+import os
+import hashlib
+import threading
+import time
+import logging
+from typing import NamedTuple, Optional
+from app.catalog import CatalogVersion, SceneContextCache, catalog_version, scene_cache
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Relative audio paths stored on scene levels are relative to the app package, as
+# they are for send_file
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Configure audio storage directory
+AUDIO_DIR = os.path.join(APP_DIR, 'static', 'audio')
+
+class AudioFile(NamedTuple):
+    path: str
+    etag: str
+
+
+def content_etag(path: str) -> str:
+    """sha256 of the file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class AudioIndex:
+    """
+    Maps (scene_id, level) to the opening-remarks audio file to serve and its content
+    hash, so repeat requests skip the scene level lookup, the existence checks and
+    hashing. Cleared whenever the catalog version changes; misses are only remembered
+    for miss_ttl seconds, so files dropped into the audio directory by hand are picked
+    up without a catalog change. The cached file is re-stat'ed on every hit and its
+    content hash kept per (mtime, size), so a file replaced in place gets a new ETag
+    while an unchanged one is never hashed twice.
+    """
+
+    def __init__(self, version: CatalogVersion, scenes: SceneContextCache, audio_dir: str = AUDIO_DIR,
+                 miss_ttl: float = None):
+        self.version = version
+        self.scenes = scenes
+        self.audio_dir = audio_dir
+        self.miss_ttl = Config.AUDIO_MISS_TTL if miss_ttl is None else miss_ttl
+        self._entries = {}
+        self._misses = {}
+        self._etags = {}
+        self._cached_version = None
+        self._lock = threading.Lock()
+
+    def resolve(self, scene_id, level) -> Optional[AudioFile]:
+        level = level.upper()
+        key = (str(scene_id), level)
+        current = self.version.current()
+        with self._lock:
+            if current != self._cached_version:
+                self._entries.clear()
+                self._misses.clear()
+                self._cached_version = current
+            entry = self._entries.get(key)
+            if entry is None and self._misses.get(key, 0) > time.monotonic():
+                return None
+        if entry is not None:
+            entry = self._revalidate(entry)
+            with self._lock:
+                if entry is None:
+                    self._entries.pop(key, None)
+                else:
+                    self._entries[key] = entry
+        if entry is None:
+            entry = self._resolve(scene_id, level)
+            with self._lock:
+                if entry is None:
+                    self._misses[key] = time.monotonic() + self.miss_ttl
+                else:
+                    self._entries[key] = entry
+                    self._misses.pop(key, None)
+        return entry
+
+    def forget(self, scene_id, level):
+        """Drop a cached entry, e.g. after its file turned out to be missing"""
+        with self._lock:
+            self._entries.pop((str(scene_id), level.upper()), None)
+            self._misses.pop((str(scene_id), level.upper()), None)
+
+    def _resolve(self, scene_id, level) -> Optional[AudioFile]:
+        # Scene-specific audio first, then the default audio for the level
+        scene_level = self.scenes.get_scene_level(scene_id, level)
+        candidates = []
+        if scene_level and scene_level.get('opening_remarks_audio_path'):
+            candidates.append(scene_level['opening_remarks_audio_path'])
+        candidates.append(os.path.join(self.audio_dir, f'default_{level}.mp3'))
+
+        for path in candidates:
+            path = os.path.join(APP_DIR, path)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            logger.info(f"Resolved opening remarks audio for {scene_id}/{level}: {path}")
+            return AudioFile(path, self._etag(path, stat))
+        return None
+
+    def _revalidate(self, entry: AudioFile) -> Optional[AudioFile]:
+        """The cached entry with its ETag refreshed if the file changed, or None if it's gone"""
+        try:
+            stat = os.stat(entry.path)
+        except OSError:
+            return None
+        etag = self._etag(entry.path, stat)
+        return entry if etag == entry.etag else AudioFile(entry.path, etag)
+
+    def _etag(self, path: str, stat: os.stat_result) -> str:
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._etags.get(path)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        etag = content_etag(path)
+        with self._lock:
+            self._etags[path] = (stamp, etag)
+        return etag
+
+
+audio_index = AudioIndex(catalog_version, scene_cache)
@@ -24,6 +24,50 @@ if not firebase_admin._apps:
         logger.error(f"Failed to initialize Firebase Admin SDK: {str(e)}", exc_info=True)
         raise
 
+def authenticate_token(token: str) -> dict:
+    """
+    Verify a Firebase ID token and return the user info views see as request.user.
+
+    Raises the firebase auth errors; token_error_message() turns them into client messages.
+    """
+    logger.debug(f"Attempting to verify token: {token[:20]}...")
+    
+    # Verify the ID token
+    logger.debug("Starting token verification...")
+    decoded_token = auth.verify_id_token(token)
+    logger.debug(f"Token verified successfully for user: {decoded_token.get('uid')}")
+    
+    # Get authentication provider information
+    provider_id = decoded_token.get('firebase', {}).get('sign_in_provider')
+    logger.info(f"User authenticated with provider: {provider_id}")
+    
+    user = {
+        'uid': decoded_token['uid'],
+        'email': decoded_token.get('email'),
+        'email_verified': decoded_token.get('email_verified', False),
+        'auth_provider': provider_id,  # Will be 'password', 'facebook.com', 'google.com', etc.
+        'name': decoded_token.get('name'),
+        'picture': decoded_token.get('picture')
+    }
+    
+    # Log authentication information
+    logger.info(f"Authenticated request from user {user['uid']} using provider {provider_id}")
+    return user
+
+def token_error_message(e: Exception) -> str:
+    """Log a token verification failure and return the message to send the client"""
+    if isinstance(e, auth.ExpiredIdTokenError):
+        logger.error(f"Token expired: {str(e)}")
+        return 'Token has expired'
+    if isinstance(e, auth.RevokedIdTokenError):
+        logger.error(f"Token revoked: {str(e)}")
+        return 'Token has been revoked'
+    if isinstance(e, auth.InvalidIdTokenError):
+        logger.error(f"Invalid token: {str(e)}", exc_info=True)
+        return 'Invalid token'
+    logger.error(f"Token verification error: {str(e)}", exc_info=True)
+    return 'Failed to verify token'
+
 def verify_token(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
@@ -38,44 +82,15 @@ def verify_token(f):
             return jsonify({'error': 'Invalid authorization header format'}), 401
         
         token = auth_header.split('Bearer ')[1]
-        logger.debug(f"Attempting to verify token: {token[:20]}...")
         
         try:
-            # Verify the ID token
-            logger.debug("Starting token verification...")
-            decoded_token = auth.verify_id_token(token)
-            logger.debug(f"Token verified successfully for user: {decoded_token.get('uid')}")
-            
-            # Get authentication provider information
-            provider_id = decoded_token.get('firebase', {}).get('sign_in_provider')
-            logger.info(f"User authenticated with provider: {provider_id}")
-            
             # Add user info to request context
-            request.user = {
-                'uid': decoded_token['uid'],
-                'email': decoded_token.get('email'),
-                'email_verified': decoded_token.get('email_verified', False),
-                'auth_provider': provider_id,  # Will be 'password', 'facebook.com', 'google.com', etc.
-                'name': decoded_token.get('name'),
-                'picture': decoded_token.get('picture')
-            }
-            
-            # Log authentication information
-            logger.info(f"Authenticated request from user {request.user['uid']} using provider {provider_id}")
+            request.user = authenticate_token(token)
             
-            return f(*args, **kwargs)
-        except auth.ExpiredIdTokenError as e:
-            logger.error(f"Token expired: {str(e)}")
-            return jsonify({'error': 'Token has expired'}), 401
-        except auth.InvalidIdTokenError as e:
-            logger.error(f"Invalid token: {str(e)}", exc_info=True)
-            return jsonify({'error': 'Invalid token'}), 401
-        except auth.RevokedIdTokenError as e:
-            logger.error(f"Token revoked: {str(e)}")
-            return jsonify({'error': 'Token has been revoked'}), 401
+            # ensure_sync lets the wrapped view be either a regular or an async function
+            return current_app.ensure_sync(f)(*args, **kwargs)
         except Exception as e:
-            logger.error(f"Token verification error: {str(e)}", exc_info=True)
-            return jsonify({'error': 'Failed to verify token'}), 401
+            return jsonify({'error': token_error_message(e)}), 401
     
     return decorated_function
 
@@ -106,6 +121,6 @@ def verify_same_user(f):
             logger.error(f"User ID mismatch: {request.user['uid']} != {user_id}")
             return jsonify({'error': 'Unauthorized access'}), 403
         
-        return f(*args, **kwargs)
+        return current_app.ensure_sync(f)(*args, **kwargs)
     
     return decorated_function 
\ No newline at end of file
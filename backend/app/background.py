@@ -0,0 +1,27 @@
+import logging
+import traceback
+from concurrent.futures import ThreadPoolExecutor, Future
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Shared pool for work that shouldn't hold up a response (summaries, bookkeeping writes)
+executor = ThreadPoolExecutor(max_workers=Config.BACKGROUND_WORKERS, thread_name_prefix='background')
+
+
+def _log_failure(future: Future):
+    if future.cancelled():
+        return
+    error = future.exception()
+    if error is not None:
+        logger.error(
+            f"Background task failed: {str(error)}\n"
+            f"{''.join(traceback.format_exception(type(error), error, error.__traceback__))}"
+        )
+
+
+def submit(fn, *args, **kwargs) -> Future:
+    """Run fn in the background pool; failures are logged rather than lost"""
+    future = executor.submit(fn, *args, **kwargs)
+    future.add_done_callback(_log_failure)
+    return future
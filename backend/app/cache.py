@@ -0,0 +1,189 @@
+import re
+import hashlib
+import threading
+import time
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Optional
+from app.extensions import mongo
+
+logger = logging.getLogger(__name__)
+
+_PUNCTUATION_RE = re.compile(r'[^\w\s]')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace so trivially different inputs share a key"""
+    text = _PUNCTUATION_RE.sub(' ', (text or '').lower())
+    return _WHITESPACE_RE.sub(' ', text).strip()
+
+
+def fingerprint(*parts) -> str:
+    """Stable hash of the given parts, used as a cache key"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode('utf-8'))
+        digest.update(b'\x1f')
+    return digest.hexdigest()
+
+
+class CacheStats:
+    """Hit/miss/eviction counters shared by the cache backends"""
+
+    def __init__(self):
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _record(self, hit: bool):
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def _record_evictions(self, count: int):
+        with self._stats_lock:
+            self.evictions += count
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            lookups = self.hits + self.misses
+            return {
+                'backend': self.backend,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': (self.hits / lookups) if lookups else 0.0,
+                'size': self.size()
+            }
+
+
+class LRUCache(CacheStats):
+    """Thread-safe in-process cache with LRU eviction and an optional TTL"""
+    backend = 'memory'
+
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = None):
+        super().__init__()
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self._record(True)
+                    return value
+                del self._entries[key]
+        self._record(False)
+        return None
+
+    def set(self, key: str, value: Any):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        evicted = 0
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                evicted += 1
+        if evicted:
+            self._record_evictions(evicted)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def size(self) -> int:
+        return len(self._entries)
+
+
+class MongoCache(CacheStats):
+    """
+    Cache stored in a Mongo collection so it is shared by every worker.
+
+    Expired entries are removed by the TTL index on expires_at (see app.indexes);
+    the size bound is enforced by trimming the least recently used entries.
+    """
+    backend = 'mongo'
+
+    # Check the size bound once every this many writes rather than on every set
+    TRIM_INTERVAL = 100
+
+    def __init__(self, collection_name: str, max_size: int = 1024, ttl: Optional[float] = None):
+        super().__init__()
+        self.collection_name = collection_name
+        self.max_size = max_size
+        self.ttl = ttl
+        self._writes = 0
+
+    @property
+    def collection(self):
+        return mongo.db[self.collection_name]
+
+    def get(self, key: str) -> Optional[Any]:
+        now = datetime.utcnow()
+        entry = self.collection.find_one_and_update(
+            {'_id': key, '$or': [{'expires_at': None}, {'expires_at': {'$gt': now}}]},
+            {'$set': {'last_used_at': now}},
+            projection={'value': 1}
+        )
+        self._record(entry is not None)
+        return entry['value'] if entry else None
+
+    def set(self, key: str, value: Any):
+        now = datetime.utcnow()
+        self.collection.replace_one(
+            {'_id': key},
+            {
+                'value': value,
+                'created_at': now,
+                'last_used_at': now,
+                'expires_at': now + timedelta(seconds=self.ttl) if self.ttl else None
+            },
+            upsert=True
+        )
+        self._writes += 1
+        if self._writes % self.TRIM_INTERVAL == 0:
+            self._trim()
+
+    def delete(self, key: str):
+        self.collection.delete_one({'_id': key})
+
+    def clear(self):
+        self.collection.delete_many({})
+
+    def size(self) -> int:
+        return self.collection.estimated_document_count()
+
+    def _trim(self):
+        """Delete the least recently used entries beyond max_size"""
+        excess = self.collection.count_documents({}) - self.max_size
+        if excess <= 0:
+            return
+        stale = [doc['_id'] for doc in self.collection.find(
+            {}, {'_id': 1}, sort=[('last_used_at', 1)], limit=excess
+        )]
+        result = self.collection.delete_many({'_id': {'$in': stale}})
+        self._record_evictions(result.deleted_count)
+
+
+def create_cache(backend: str, collection_name: str, max_size: int, ttl: Optional[float] = None):
+    """Build a cache for the configured backend ("memory" or "mongo")"""
+    if backend == 'mongo':
+        return MongoCache(collection_name, max_size=max_size, ttl=ttl)
+    if backend != 'memory':
+        logger.warning(f"Unknown cache backend '{backend}', falling back to in-process cache")
+    return LRUCache(max_size=max_size, ttl=ttl)
@@ -0,0 +1,234 @@
+import gzip
+import json
+import threading
+import time
+import logging
+from functools import wraps
+from typing import NamedTuple
+from bson import ObjectId
+from flask import request, current_app, make_response
+from pymongo import ReturnDocument
+from app.extensions import mongo
+from app.cache import LRUCache
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Stored in place of a missing scene level so "not found" is cached too
+_NOT_FOUND = object()
+
+
+class CatalogVersion:
+    """
+    Version counter for the topic/scene catalog, stored in Mongo so every worker sees it.
+
+    bump() is called by the create endpoints. current() re-reads the stored value at most
+    once per CATALOG_VERSION_CHECK_INTERVAL seconds, so other workers pick up changes
+    within that interval without a Mongo read on every request.
+    """
+    META_ID = 'catalog'
+
+    def __init__(self, check_interval: float = None):
+        self.check_interval = Config.CATALOG_VERSION_CHECK_INTERVAL if check_interval is None else check_interval
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def current(self) -> int:
+        with self._lock:
+            now = time.monotonic()
+            if self._version is None or now - self._checked_at >= self.check_interval:
+                meta = mongo.db.catalog_meta.find_one({'_id': self.META_ID})
+                self._version = meta['version'] if meta else 0
+                self._checked_at = now
+            return self._version
+
+    def bump(self) -> int:
+        meta = mongo.db.catalog_meta.find_one_and_update(
+            {'_id': self.META_ID},
+            {'$inc': {'version': 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        with self._lock:
+            self._version = meta['version']
+            self._checked_at = time.monotonic()
+        logger.info(f"Catalog version bumped to {meta['version']}")
+        return meta['version']
+
+
+class SceneContextCache:
+    """
+    Read-through cache for scene and scene-level documents and the prompt data derived
+    from them. The whole cache is dropped whenever the catalog version changes.
+
+    Returned dicts are shared between requests and must not be modified.
+    """
+
+    def __init__(self, version: CatalogVersion, max_size: int = None):
+        self.version = version
+        self._cache = LRUCache(max_size=max_size or Config.SCENE_CACHE_MAX_SIZE)
+        self._cached_version = None
+        self._lock = threading.Lock()
+
+    def _sync_version(self):
+        """Clear the cache if the catalog changed since it was filled"""
+        current = self.version.current()
+        with self._lock:
+            if current != self._cached_version:
+                self._cache.clear()
+                self._cached_version = current
+
+    def _get(self, key, load):
+        self._sync_version()
+        value = self._cache.get(key)
+        if value is None:
+            value = load()
+            self._cache.set(key, _NOT_FOUND if value is None else value)
+        return None if value is _NOT_FOUND else value
+
+    def get_scene(self, scene_id):
+        return self._get(
+            ('scene', str(scene_id)),
+            lambda: mongo.db.scenes.find_one({'_id': ObjectId(scene_id)})
+        )
+
+    def get_scene_level(self, scene_id, level):
+        return self._get(
+            ('scene_level', str(scene_id), level.upper()),
+            lambda: mongo.db.scene_levels.find_one({
+                'scene_id': ObjectId(scene_id),
+                'english_level': level.upper()
+            })
+        )
+
+    def get_scene_data(self, scene_id, level) -> dict:
+        """Scene data shaped for the prompt builders, with the vocabulary already split"""
+        def build():
+            scene = self.get_scene(scene_id)
+            if not scene:
+                return None
+            scene_level = self.get_scene_level(scene_id, level)
+            return {
+                "title": scene['name'],
+                "description": scene.get('description'),
+                "vocabulary": scene_level.get('vocabulary', '').split(',') if scene_level and scene_level.get('vocabulary') else [],
+                "phrases": [],
+                "questions": []
+            }
+
+        scene_data = self._get(('scene_data', str(scene_id), level.upper()), build)
+        if scene_data is None:
+            raise ValueError("Scene not found")
+        return scene_data
+
+    def stats(self) -> dict:
+        stats = self._cache.stats()
+        stats['catalog_version'] = self._cached_version
+        return stats
+
+
+class CatalogSnapshot(NamedTuple):
+    version: int
+    body: bytes
+    gzipped: bytes
+
+
+class CatalogSnapshots:
+    """
+    The whole catalog for one English level as a single JSON document, built once per
+    catalog version and kept both plain and gzip-compressed.
+
+    Snapshots for every level are dropped when the catalog version changes and rebuilt
+    on the next request.
+    """
+
+    def __init__(self, version: CatalogVersion):
+        self.version = version
+        self._snapshots = {}
+        self._lock = threading.Lock()
+        self.builds = 0
+
+    def get(self, level: str) -> CatalogSnapshot:
+        level = level.upper()
+        current = self.version.current()
+        snapshot = self._snapshots.get(level)
+        if snapshot is not None and snapshot.version == current:
+            return snapshot
+        with self._lock:
+            # Another request may have built it while we waited
+            snapshot = self._snapshots.get(level)
+            if snapshot is None or snapshot.version != current:
+                if any(cached.version != current for cached in self._snapshots.values()):
+                    self._snapshots.clear()
+                snapshot = self._build(current, level)
+                self._snapshots[level] = snapshot
+            return snapshot
+
+    def _build(self, version: int, level: str) -> CatalogSnapshot:
+        # version was read before this data, so a concurrent change can only make the
+        # snapshot newer than its tag, never older
+        scene_levels = {
+            scene_level['scene_id']: {
+                'id': str(scene_level['_id']),
+                'englishLevel': scene_level['english_level'],
+                'keyPhrases': scene_level.get('key_phrases'),
+                'vocabulary': scene_level.get('vocabulary'),
+                'grammarPoints': scene_level.get('grammar_points')
+            }
+            for scene_level in mongo.db.scene_levels.find(
+                {'english_level': level},
+                {'scene_id': 1, 'english_level': 1, 'key_phrases': 1, 'vocabulary': 1, 'grammar_points': 1}
+            )
+        }
+        scenes_by_topic = {}
+        for scene in mongo.db.scenes.find({}, {'name': 1, 'description': 1, 'topic_id': 1}, sort=[('_id', 1)]):
+            scenes_by_topic.setdefault(scene.get('topic_id'), []).append({
+                'id': str(scene['_id']),
+                'name': scene['name'],
+                'description': scene.get('description'),
+                'level': scene_levels.get(scene['_id'])
+            })
+        topics = [{
+            'id': str(topic['_id']),
+            'name': topic['name'],
+            'description': topic.get('description'),
+            'scenes': scenes_by_topic.get(topic['_id'], [])
+        } for topic in mongo.db.topics.find({}, {'name': 1, 'description': 1}, sort=[('_id', 1)])]
+
+        body = json.dumps(
+            {'version': version, 'level': level, 'topics': topics},
+            ensure_ascii=False, separators=(',', ':')
+        ).encode('utf-8')
+        self.builds += 1
+        logger.info(f"Built catalog snapshot for level {level} at version {version} ({len(body)} bytes)")
+        return CatalogSnapshot(version, body, gzip.compress(body, mtime=0))
+
+
+catalog_version = CatalogVersion()
+scene_cache = SceneContextCache(catalog_version)
+catalog_snapshots = CatalogSnapshots(catalog_version)
+
+
+def catalog_etag(f):
+    """
+    Conditional GET for catalog views: responses carry a strong ETag derived from the
+    catalog version, and a request whose If-None-Match matches it gets a 304 without
+    running the view. Cache-Control makes clients revalidate on every use.
+
+    Other workers see a version bump within CATALOG_VERSION_CHECK_INTERVAL seconds.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        etag = f"catalog-{catalog_version.current()}"
+        if request.if_none_match.contains(etag):
+            response = current_app.response_class(status=304)
+        else:
+            response = make_response(current_app.ensure_sync(f)(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+
+    return decorated_function
@@ -0,0 +1,138 @@
+from datetime import datetime
+from typing import List, NamedTuple, Optional, Tuple
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from app.extensions import mongo
+from app.models.mongo_models import MessageBucket
+
+
+class ConversationHistory(NamedTuple):
+    """What the prompt builders see of a session: a rolling summary plus recent raw messages"""
+    summary: Optional[str]
+    messages: List[dict]
+
+    def tail(self, limit: int) -> 'ConversationHistory':
+        """The same history with only the last `limit` raw messages"""
+        return ConversationHistory(self.summary, self.messages[-limit:])
+
+
+def read_messages(session_id, start: int, stop: int) -> List[dict]:
+    """
+    Get messages [start, stop) of a session, oldest first.
+
+    Reads only the buckets covering that range, in one indexed query.
+    """
+    if stop <= start:
+        return []
+    buckets = mongo.db.message_buckets.find(
+        {
+            'session_id': ObjectId(session_id),
+            'seq': {'$gte': MessageBucket.seq_for(start), '$lte': MessageBucket.seq_for(stop - 1)}
+        },
+        {'messages': 1},
+        sort=[('seq', 1)]
+    )
+    messages = [msg for bucket in buckets for msg in bucket['messages'] if start <= msg['index'] < stop]
+    # Concurrent appends can land in a bucket slightly out of order
+    messages.sort(key=lambda msg: msg['index'])
+    return messages
+
+
+def load_history(session_id, limit: int) -> ConversationHistory:
+    """
+    Get the session's rolling summary and up to `limit` of its most recent messages
+    that the summary doesn't already cover, oldest first.
+
+    Reads the session's counters and then only the tail buckets, so read cost
+    stays flat however long the session gets.
+    """
+    session = mongo.db.conversation_sessions.find_one(
+        {'_id': ObjectId(session_id)},
+        {'_id': 1, 'summary': 1, 'summarized_count': 1, 'message_count': 1}
+    )
+    if not session:
+        raise ValueError("Session not found")
+
+    message_count = session.get('message_count') or 0
+    start = max(message_count - limit, session.get('summarized_count') or 0)
+    return ConversationHistory(session.get('summary'), read_messages(session_id, start, message_count))
+
+
+def load_summary(session_id) -> Tuple[Optional[str], int]:
+    """Get the session's rolling summary and how many messages it covers"""
+    session = mongo.db.conversation_sessions.find_one(
+        {'_id': ObjectId(session_id)},
+        {'_id': 1, 'summary': 1, 'summarized_count': 1}
+    )
+    if not session:
+        raise ValueError("Session not found")
+    return session.get('summary'), session.get('summarized_count') or 0
+
+
+def append_message(session_id, role: str, text: str) -> Optional[dict]:
+    """
+    Append a message to a session.
+
+    Reserves the next message index on the session (and marks it active), then pushes
+    the message into the bucket for that index. Returns the session's message_count and
+    summarized_count after the append, or None if the session doesn't exist.
+    """
+    session = mongo.db.conversation_sessions.find_one_and_update(
+        {'_id': ObjectId(session_id)},
+        {'$inc': {'message_count': 1}, '$set': {'last_activity_at': datetime.utcnow()}},
+        projection={'_id': 1, 'message_count': 1, 'summarized_count': 1},
+        return_document=ReturnDocument.AFTER
+    )
+    if not session:
+        return None
+
+    index = session['message_count'] - 1
+    push_to_bucket(session['_id'], MessageBucket.make_message(index, role, text))
+    return session
+
+
+def push_to_bucket(session_id: ObjectId, message: dict):
+    """Add a message to the bucket its index belongs to, creating the bucket if needed"""
+    query = {'session_id': session_id, 'seq': MessageBucket.seq_for(message['index'])}
+    update = {
+        '$push': {'messages': message},
+        '$inc': {'count': 1},
+        '$setOnInsert': {'created_at': datetime.utcnow()}
+    }
+    try:
+        mongo.db.message_buckets.update_one(query, update, upsert=True)
+    except DuplicateKeyError:
+        # Another append created the bucket at the same moment; it exists now
+        mongo.db.message_buckets.update_one(query, update)
+
+
+def save_summary(session_id, summary: str, previous_count: int, summarized_count: int) -> bool:
+    """
+    Store a new rolling summary covering the first `summarized_count` messages.
+
+    Only applies if the summary still covers `previous_count` messages, so a slower
+    concurrent summarization can't overwrite a newer one.
+    """
+    result = mongo.db.conversation_sessions.update_one(
+        {'_id': ObjectId(session_id), 'summarized_count': previous_count or {'$in': [0, None]}},
+        {'$set': {'summary': summary, 'summarized_count': summarized_count}}
+    )
+    return result.modified_count == 1
+
+
+def end_session(session_id, user_uid) -> Optional[dict]:
+    """
+    Mark the user's session ended, keeping the first end time if it was already ended.
+    Returns the session, or None if the user has no such session.
+    """
+    now = datetime.utcnow()
+    query = {'_id': ObjectId(session_id), 'user_uid': user_uid}
+    projection = {'_id': 1, 'ended_at': 1, 'message_count': 1}
+    session = mongo.db.conversation_sessions.find_one_and_update(
+        {**query, 'ended_at': None},
+        {'$set': {'ended_at': now, 'last_activity_at': now}},
+        projection=projection,
+        return_document=ReturnDocument.AFTER
+    )
+    return session or mongo.db.conversation_sessions.find_one(query, projection)
@@ -1,3 +1,5 @@
 from flask_pymongo import PyMongo
+from flask_sock import Sock
 
-mongo = PyMongo() 
\ No newline at end of file
+mongo = PyMongo()
+sock = Sock()
\ No newline at end of file
@@ -0,0 +1,125 @@
+import time
+import logging
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import request, jsonify, current_app, make_response
+from pymongo.errors import DuplicateKeyError
+from app.extensions import mongo
+from app.cache import fingerprint
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+# Response headers stored with the record and restored on replay
+REPLAYED_HEADERS = ('Location', 'Retry-After')
+
+
+def _claim(record_id: str, request_hash: str) -> bool:
+    """Record the key as in progress; False if another request already holds it"""
+    now = datetime.utcnow()
+    record = {
+        'status': 'in_progress',
+        'request_hash': request_hash,
+        'created_at': now,
+        'locked_until': now + timedelta(seconds=Config.IDEMPOTENCY_LOCK_TIMEOUT),
+        'expires_at': now + timedelta(seconds=Config.IDEMPOTENCY_TTL)
+    }
+    try:
+        mongo.db.idempotency_keys.insert_one({'_id': record_id, **record})
+        return True
+    except DuplicateKeyError:
+        # Take over a key whose request died without finishing (e.g. the worker was killed)
+        result = mongo.db.idempotency_keys.update_one(
+            {'_id': record_id, 'status': 'in_progress', 'locked_until': {'$lt': now}},
+            {'$set': record}
+        )
+        return result.modified_count == 1
+
+
+def _wait_for(record_id: str):
+    """Wait for an in-progress request with the same key to finish; returns its record"""
+    deadline = time.monotonic() + Config.IDEMPOTENCY_WAIT_TIMEOUT
+    while True:
+        record = mongo.db.idempotency_keys.find_one({'_id': record_id})
+        if record is None or record['status'] == 'done' or time.monotonic() >= deadline:
+            return record
+        time.sleep(Config.IDEMPOTENCY_POLL_INTERVAL)
+
+
+def _replay(record):
+    response = current_app.response_class(
+        record['body'],
+        status=record['status_code'],
+        mimetype=record.get('mimetype') or 'application/json'
+    )
+    for name, value in (record.get('headers') or {}).items():
+        response.headers[name] = value
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(f):
+    """
+    Honour an Idempotency-Key header: the first request with a key runs the view and
+    its response is stored; retries with the same key (per user) replay that response,
+    waiting for it if the first request is still running.
+
+    Streamed responses and server errors aren't stored, so those requests can be retried.
+    Must be applied after verify_token.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return current_app.ensure_sync(f)(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({'error': f'{HEADER} must be at most {MAX_KEY_LENGTH} characters'}), 400
+
+        record_id = f"{request.user['uid']}:{key}"
+        request_hash = fingerprint(request.method, request.path, request.get_data(as_text=True))
+
+        if not _claim(record_id, request_hash):
+            record = _wait_for(record_id)
+            if record is None:
+                # The first request failed and released the key; run this one instead
+                if not _claim(record_id, request_hash):
+                    return jsonify({'error': 'A request with this Idempotency-Key is already in progress'}), 409
+            elif record['request_hash'] != request_hash:
+                logger.warning(f"{HEADER} reused with a different request: {record_id}")
+                return jsonify({'error': f'{HEADER} was already used for a different request'}), 422
+            elif record['status'] == 'done':
+                logger.info(f"Replaying stored response for {HEADER} {record_id}")
+                return _replay(record)
+            else:
+                response = jsonify({'error': 'A request with this Idempotency-Key is still in progress'})
+                response.headers['Retry-After'] = '1'
+                return response, 409
+
+        try:
+            response = make_response(current_app.ensure_sync(f)(*args, **kwargs))
+        except Exception:
+            mongo.db.idempotency_keys.delete_one({'_id': record_id})
+            raise
+
+        if response.is_streamed or response.status_code >= 500:
+            mongo.db.idempotency_keys.delete_one({'_id': record_id})
+            return response
+
+        mongo.db.idempotency_keys.update_one(
+            {'_id': record_id},
+            {
+                '$set': {
+                    'status': 'done',
+                    'status_code': response.status_code,
+                    'mimetype': response.mimetype,
+                    'body': response.get_data(as_text=True),
+                    'headers': {name: response.headers[name] for name in REPLAYED_HEADERS if name in response.headers}
+                },
+                '$unset': {'locked_until': ''}
+            }
+        )
+        return response
+
+    return decorated_function
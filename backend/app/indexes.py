@@ -0,0 +1,33 @@
+import logging
+from pymongo import ASCENDING
+
+logger = logging.getLogger(__name__)
+
+
+def ensure_indexes(db):
+    """Create the indexes the application relies on (no-op for existing indexes)"""
+    # Shared tutor response cache: expire entries by TTL, trim by least recent use
+    db.tutor_response_cache.create_index([('expires_at', ASCENDING)], expireAfterSeconds=0)
+    db.tutor_response_cache.create_index([('last_used_at', ASCENDING)])
+
+    # Bucketed session messages: one bucket per (session, sequence number)
+    db.message_buckets.create_index([('session_id', ASCENDING), ('seq', ASCENDING)], unique=True)
+
+    # Idempotency-Key records expire after IDEMPOTENCY_TTL
+    db.idempotency_keys.create_index([('expires_at', ASCENDING)], expireAfterSeconds=0)
+
+    # Tutor feedback jobs expire TUTOR_JOB_TTL after they are created
+    db.tutor_jobs.create_index([('expires_at', ASCENDING)], expireAfterSeconds=0)
+
+    # Session archiving: find ended and idle sessions, expire archives after the retention period
+    db.conversation_sessions.create_index([('ended_at', ASCENDING)])
+    db.conversation_sessions.create_index([('last_activity_at', ASCENDING)])
+    db.conversation_archive.create_index([('expires_at', ASCENDING)], expireAfterSeconds=0)
+    db.conversation_archive.create_index([('user_uid', ASCENDING)])
+
+    # Keyset pagination of a topic's scenes
+    db.scenes.create_index([('topic_id', ASCENDING), ('_id', ASCENDING)])
+
+    # Scene hierarchy: a scene's descendants by ancestor id, in depth-first order by path
+    db.scenes.create_index([('ancestors._id', ASCENDING)])
+    db.scenes.create_index([('path', ASCENDING)])
@@ -0,0 +1,163 @@
+import json
+import logging
+from datetime import datetime
+from typing import Dict, List, Tuple
+from pymongo import InsertOne
+from pymongo.errors import BulkWriteError
+from app.extensions import mongo
+from app.models.mongo_models import UnfamiliarWord, WrongGrammar, BestFitWord, BetterExpression
+
+logger = logging.getLogger(__name__)
+
+# Tutor feedback category -> learning collection it is stored in
+FEEDBACK_COLLECTIONS = {
+    'unfamiliar_words': 'unfamiliar_words',
+    'grammar_errors': 'grammar_mistakes',
+    'wrong_expressions': 'expression_improvements',
+    'best_fit_words': 'word_improvements'
+}
+
+# Batch item type -> (collection, model, required fields, optional fields)
+LEARNING_ITEM_TYPES = {
+    'unfamiliar_word': ('unfamiliar_words', UnfamiliarWord, ('session_id', 'word'), ('context',)),
+    'grammar_mistake': ('grammar_mistakes', WrongGrammar, ('session_id', 'wrong_text', 'correct_text'), ('explanation',)),
+    'word_improvement': ('word_improvements', BestFitWord, ('session_id', 'original_word', 'suggested_word'), ('context',)),
+    'expression_improvement': ('expression_improvements', BetterExpression, ('session_id', 'original_text', 'suggested_text'), ('explanation',))
+}
+
+
+def _pairs(entries, original_keys, suggestion_keys):
+    """
+    Normalize a feedback category to (original, suggestion, explanation) tuples.
+
+    The tutor returns either {original: suggestion} / {original: {...}} objects or
+    lists of objects, depending on the model's mood; accept all of them.
+    """
+    def pick(item, keys):
+        return next((item[k] for k in keys if item.get(k)), None)
+
+    if isinstance(entries, dict):
+        for original, value in entries.items():
+            if isinstance(value, dict):
+                yield original, pick(value, suggestion_keys), value.get('explanation')
+            else:
+                yield original, value, None
+    elif isinstance(entries, list):
+        for item in entries:
+            if isinstance(item, dict):
+                yield pick(item, original_keys), pick(item, suggestion_keys), item.get('explanation')
+
+
+def feedback_to_documents(feedback: dict, session_id, user_uid, context=None) -> Dict[str, List[dict]]:
+    """Turn parsed tutor feedback into learning documents, grouped by target collection"""
+    documents = {collection: [] for collection in FEEDBACK_COLLECTIONS.values()}
+
+    for word in feedback.get('unfamiliar_words') or []:
+        if isinstance(word, dict):
+            word = word.get('word')
+        if word:
+            documents['unfamiliar_words'].append(
+                UnfamiliarWord(session_id=session_id, user_uid=user_uid, word=word, context=context).to_dict()
+            )
+
+    for wrong, correct, explanation in _pairs(feedback.get('grammar_errors'), ('wrong', 'error', 'original'), ('correct', 'correction', 'suggestion')):
+        if wrong and correct:
+            documents['grammar_mistakes'].append(WrongGrammar(
+                session_id=session_id, user_uid=user_uid, wrong_text=wrong, correct_text=correct, explanation=explanation
+            ).to_dict())
+
+    for original, suggested, explanation in _pairs(feedback.get('wrong_expressions'), ('original', 'expression'), ('suggested', 'suggestion', 'better')):
+        if original and suggested:
+            documents['expression_improvements'].append(BetterExpression(
+                session_id=session_id, user_uid=user_uid, original_text=original, suggested_text=suggested, explanation=explanation
+            ).to_dict())
+
+    for original, suggested, _ in _pairs(feedback.get('best_fit_words'), ('original', 'word'), ('suggested', 'suggestion', 'better')):
+        if original and suggested:
+            documents['word_improvements'].append(BestFitWord(
+                session_id=session_id, user_uid=user_uid, original_word=original, suggested_word=suggested, context=context
+            ).to_dict())
+
+    return {collection: docs for collection, docs in documents.items() if docs}
+
+
+def persist_feedback(feedback, session_id, user_uid, context=None) -> Dict[str, int]:
+    """
+    Store tutor feedback in the learning collections with one insert_many per collection.
+
+    feedback may be the parsed dict or its JSON string. Returns the number of
+    documents written per collection.
+    """
+    if isinstance(feedback, str):
+        feedback = json.loads(feedback)
+
+    written = {}
+    for collection, docs in feedback_to_documents(feedback, session_id, user_uid, context).items():
+        result = mongo.db[collection].insert_many(docs, ordered=False)
+        written[collection] = len(result.inserted_ids)
+    if written:
+        logger.info(f"Stored tutor feedback for session {session_id}: {written}")
+    return written
+
+
+def build_learning_item(item, user_uid) -> Tuple[str, dict]:
+    """
+    Validate one batch item and build its document.
+
+    Returns (collection, document); raises ValueError describing what's wrong with the item.
+    """
+    if not isinstance(item, dict):
+        raise ValueError("item must be an object")
+    if item.get('type') not in LEARNING_ITEM_TYPES:
+        raise ValueError(f"type must be one of: {', '.join(LEARNING_ITEM_TYPES)}")
+
+    collection, model, required, optional = LEARNING_ITEM_TYPES[item['type']]
+    missing = [field for field in required if not item.get(field)]
+    if missing:
+        raise ValueError(f"{', '.join(missing)} required for {item['type']}")
+
+    fields = {field: item[field] for field in required}
+    fields.update({field: item.get(field) for field in optional})
+    if item.get('timestamp'):
+        # Offline clients send when the item was recorded, not when it was synced
+        try:
+            fields['timestamp'] = datetime.fromisoformat(str(item['timestamp']).replace('Z', '+00:00'))
+        except ValueError:
+            raise ValueError("timestamp must be an ISO 8601 date")
+    return collection, model(user_uid=user_uid, **fields).to_dict()
+
+
+def insert_learning_items(items: list, user_uid) -> List[dict]:
+    """
+    Validate and store a mixed batch of learning items.
+
+    Items are grouped by target collection and written with one unordered
+    bulk_write per collection, so a bad item doesn't stop the rest. Returns one
+    result per item, in request order: {"index", "type", "id"} on success or
+    {"index", "type", "error"} on failure.
+    """
+    results = [None] * len(items)
+    groups: Dict[str, List[Tuple[int, dict]]] = {}
+
+    for index, item in enumerate(items):
+        item_type = item.get('type') if isinstance(item, dict) else None
+        try:
+            collection, doc = build_learning_item(item, user_uid)
+        except ValueError as e:
+            results[index] = {"index": index, "type": item_type, "error": str(e)}
+            continue
+        groups.setdefault(collection, []).append((index, doc))
+        results[index] = {"index": index, "type": item_type, "id": str(doc['_id'])}
+
+    for collection, entries in groups.items():
+        try:
+            mongo.db[collection].bulk_write([InsertOne(doc) for _, doc in entries], ordered=False)
+        except BulkWriteError as e:
+            # writeErrors index into this collection's operations, not the request
+            for write_error in e.details.get('writeErrors', []):
+                index = entries[write_error['index']][0]
+                results[index].pop('id', None)
+                results[index]['error'] = write_error.get('errmsg', 'write failed')
+            logger.warning(f"Batch insert into {collection} had {len(e.details.get('writeErrors', []))} failed writes")
+
+    return results
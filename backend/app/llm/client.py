@@ -1,96 +1,340 @@
 import os
-from typing import Dict, Any
-from openai import OpenAI, APIError, APIConnectionError, RateLimitError, APITimeoutError
+import asyncio
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Dict, Any, Callable, Coroutine, Iterator, List, Optional, Tuple
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, APIError, APIConnectionError, RateLimitError, APITimeoutError
+import httpx
 import logging
 import traceback
 from ollama import chat
 from ollama import ChatResponse
+from config import Config
+from app.cache import fingerprint
+from app.llm.prompts import truncate_to_tokens
 
 logger = logging.getLogger(__name__)
 
+# Marks the end of a streamed completion in the delta queue
+_STREAM_END = object()
+
 class LLMClient:
-    def __init__(self):
+    """
+    LLM client backed by a single AsyncOpenAI instance.
+
+    All upstream calls run on a dedicated event loop thread owned by the client, so
+    every caller (sync Flask views, async views, background jobs) shares one bounded
+    keep-alive connection pool and one in-flight limit.
+    """
+
+    def __init__(self, model: str = None, timeout: float = None, max_connections: int = None,
+                 max_keepalive_connections: int = None, keepalive_expiry: float = None,
+                 max_in_flight: int = None, json_roles=None, repair_attempts: int = None):
         print("Initializing LLM client ", flush=True)
-        self.client = OpenAI(
-            api_key=os.getenv('OPENAI_API_KEY')
-        )
+        self.model = model or Config.LLM_MODEL
+        self.timeout = timeout or Config.LLM_TIMEOUT
+        self.max_connections = max_connections or Config.LLM_MAX_CONNECTIONS
+        self.max_keepalive_connections = max_keepalive_connections or Config.LLM_MAX_KEEPALIVE_CONNECTIONS
+        self.keepalive_expiry = keepalive_expiry or Config.LLM_KEEPALIVE_EXPIRY
+        self.max_in_flight = max_in_flight or Config.LLM_MAX_IN_FLIGHT
+        # Roles whose requests ask the API for a JSON object response
+        self.json_roles = set(json_roles) if json_roles is not None else ({"tutor"} if Config.TUTOR_JSON_MODE else set())
+        self.repair_attempts = Config.TUTOR_REPAIR_ATTEMPTS if repair_attempts is None else repair_attempts
+
+        # The event loop, HTTP pool and semaphore are created lazily on first use so that
+        # forking WSGI servers don't inherit a running loop thread from the parent process.
+        self._loop = None
+        self._loop_thread = None
+        self._loop_lock = threading.Lock()
+        self.client = None
+        self._in_flight = None
+
+        # Single-flight state; only touched from the client's event loop thread
+        self._pending = {}
+        self.requests = 0
+        self.upstream_calls = 0
+        self.deduplicated = 0
+
+        # Structured response counters
+        self.structured_responses = 0
+        self.parse_failures = 0
+        self.repairs = 0
+        self.repaired = 0
+        self.unrecovered = 0
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        """Start the client's event loop thread and connection pool if needed"""
+        with self._loop_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="llm-client-loop", daemon=True)
+                thread.start()
+
+                http_client = DefaultAsyncHttpxClient(
+                    limits=httpx.Limits(
+                        max_connections=self.max_connections,
+                        max_keepalive_connections=self.max_keepalive_connections,
+                        keepalive_expiry=self.keepalive_expiry
+                    ),
+                    timeout=httpx.Timeout(self.timeout)
+                )
+                self.client = AsyncOpenAI(
+                    api_key=os.getenv('OPENAI_API_KEY'),
+                    http_client=http_client
+                )
+                self._in_flight = asyncio.Semaphore(self.max_in_flight)
+                self._loop = loop
+                self._loop_thread = thread
+            return self._loop
+
+    def submit(self, coro: Coroutine) -> Future:
+        """Schedule a coroutine on the client's event loop from any thread"""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+
+    async def acomplete(self, prompt: str, message: str, temperature: float = 0.7, role: str = "partner") -> str:
+        """
+        Awaitable version of get_completion, usable from any event loop
+
+        Args:
+            prompt (str): The system prompt
+            message (str): The user message
+            temperature (float): Controls randomness in the response (0.0 to 1.0)
+            role (str): "partner" or "tutor"
+
+        Returns:
+            str: The AI's response
+        """
+        return await asyncio.wrap_future(self.submit(self._coalesced_complete(prompt, message, temperature, role)))
+
+    async def acomplete_structured(self, prompt: str, message: str, parse: Callable[[str], Any],
+                                   temperature: float = 0.7, role: str = "tutor") -> Tuple[str, Optional[Any]]:
+        """
+        Get a completion that must parse, re-asking the model to fix it if it doesn't
+
+        Args:
+            prompt (str): The system prompt
+            message (str): The user message
+            parse (callable): Parses the response text, raising ValueError if it's unusable
+            temperature (float): Controls randomness in the response (0.0 to 1.0)
+            role (str): "partner" or "tutor"
+
+        Returns:
+            tuple: The last response text and its parsed value, or None if no attempt parsed
+        """
+        return await asyncio.wrap_future(self.submit(self._structured_complete(prompt, message, parse, temperature, role)))
 
     def get_completion(self, prompt: str, message: str, temperature: float = 0.7, role: str = "partner") -> str:
         """
-        Get a completion from the API
-        
+        Get a completion from the API, blocking until it is available
+
         Args:
             prompt (str): The system prompt
             message (str): The user message
             temperature (float): Controls randomness in the response (0.0 to 1.0)
-            
+            role (str): "partner" or "tutor"
+
         Returns:
             str: The AI's response
         """
+        return self.submit(self._coalesced_complete(prompt, message, temperature, role)).result()
+
+    def close(self):
+        """Close the connection pool and stop the event loop thread"""
+        with self._loop_lock:
+            if self._loop is None:
+                return
+            asyncio.run_coroutine_threadsafe(self.client.close(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop_thread.join()
+            self._loop.close()
+            self._loop = None
+            self._loop_thread = None
+
+    def stats(self) -> dict:
+        """Request counters, including how many calls were served by an identical in-flight call"""
+        return {
+            'requests': self.requests,
+            'upstream_calls': self.upstream_calls,
+            'deduplicated': self.deduplicated,
+            'in_flight': len(self._pending),
+            'structured': {
+                'responses': self.structured_responses,
+                'parse_failures': self.parse_failures,
+                'parse_failure_rate': self.parse_failures / self.structured_responses if self.structured_responses else 0.0,
+                'repairs': self.repairs,
+                'repaired': self.repaired,
+                'unrecovered': self.unrecovered,
+                'unrecovered_rate': self.unrecovered / self.structured_responses if self.structured_responses else 0.0
+            }
+        }
+
+    def stream_completion(self, prompt: str, message: str, temperature: float = 0.7, role: str = "partner") -> Iterator[str]:
+        """
+        Stream a completion from the API, yielding text deltas as they arrive
+
+        Args:
+            prompt (str): The system prompt
+            message (str): The user message
+            temperature (float): Controls randomness in the response (0.0 to 1.0)
+            role (str): "partner" or "tutor"
+
+        Yields:
+            str: Pieces of the AI's response in order
+        """
+        chunks = queue.Queue()
+        future = self.submit(self._stream_into(chunks, prompt, message, temperature, role))
         try:
-            print(f"Prompt length: {len(prompt)}", flush=True)
-            print(f"Message length: {len(message)}", flush=True)
-            print(f"Temperature: {temperature}", flush=True)
-
-            # Truncate prompt and message if they're extremely long
-            truncated_prompt = prompt[:5000] if len(prompt) > 5000 else prompt
-            truncated_message = message[:1000] if len(message) > 1000 else message
-
-            if role == "partner":
-                response = self.client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=[
-                        {"role": "system", "content": truncated_prompt},
-                        {"role": "user", "content": truncated_message}
-                    ],
-                    temperature=temperature,
-                    stream=False,
-                    max_tokens=50,
-                    timeout=30.0
-                )
-            else:
-                response = self.client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=[
-                        {"role": "system", "content": truncated_prompt},
-                        {"role": "user", "content": truncated_message}
-                    ],
-                    temperature=temperature,
-                    stream=False,
-                    timeout=30.0
-                )
-            
+            while True:
+                item = chunks.get()
+                if item is _STREAM_END:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            # Stop generating upstream if the consumer went away (e.g. client disconnected)
+            if not future.done():
+                future.cancel()
+
+    def _request_args(self, prompt: str, message: str, temperature: float, role: str, stream: bool = False,
+                      follow_up: List[Dict[str, str]] = None) -> Dict[str, Any]:
+        """Build the chat.completions.create arguments for a role"""
+        print(f"Prompt length: {len(prompt)}", flush=True)
+        print(f"Message length: {len(message)}", flush=True)
+        print(f"Temperature: {temperature}", flush=True)
+
+        # The prompt builders already fit history into a token budget, so the system prompt
+        # is sent whole; only the user's message is capped
+        request_args = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": prompt},
+                {"role": "user", "content": truncate_to_tokens(message, Config.USER_MESSAGE_TOKEN_LIMIT)},
+                *(follow_up or [])
+            ],
+            "temperature": temperature,
+            "stream": stream,
+            "timeout": self.timeout
+        }
+        if role == "partner":
+            request_args["max_tokens"] = 50
+        if role in self.json_roles and not stream:
+            request_args["response_format"] = {"type": "json_object"}
+        return request_args
+
+    async def _coalesced_complete(self, prompt: str, message: str, temperature: float, role: str) -> str:
+        """
+        Single-flight wrapper around _complete: while an identical request is in flight,
+        later callers wait on its result instead of issuing another upstream call.
+        """
+        self.requests += 1
+        key = fingerprint(self.model, role, temperature, prompt, message)
+        task = self._pending.get(key)
+        if task is not None:
+            self.deduplicated += 1
+            print(f"Coalesced duplicate {role} request with one already in flight", flush=True)
+        else:
+            self.upstream_calls += 1
+            task = asyncio.ensure_future(self._complete(prompt, message, temperature, role))
+            self._pending[key] = task
+            task.add_done_callback(lambda _: self._pending.pop(key, None))
+        # Shield so one caller giving up doesn't cancel the request for everyone else
+        return await asyncio.shield(task)
+
+    async def _structured_complete(self, prompt: str, message: str, parse: Callable[[str], Any],
+                                   temperature: float, role: str) -> Tuple[str, Optional[Any]]:
+        """
+        Complete and parse; on a parse failure, show the model its reply and the problem
+        and ask again, at most repair_attempts times.
+        """
+        self.structured_responses += 1
+        ai_response = await self._coalesced_complete(prompt, message, temperature, role)
+        try:
+            return ai_response, parse(ai_response)
+        except ValueError as e:
+            error = e
+        self.parse_failures += 1
+        print(f"Unusable {role} response: {error}", flush=True)
+
+        for _ in range(self.repair_attempts):
+            self.repairs += 1
+            self.upstream_calls += 1
+            ai_response = await self._complete(prompt, message, temperature, role, follow_up=[
+                {"role": "assistant", "content": ai_response},
+                {"role": "user", "content": f"Your reply could not be used: {error}. "
+                                            "Reply again with only the JSON object in the required format."}
+            ])
+            try:
+                parsed = parse(ai_response)
+            except ValueError as e:
+                error = e
+                print(f"Repair of {role} response failed: {error}", flush=True)
+                continue
+            self.repaired += 1
+            return ai_response, parsed
+
+        self.unrecovered += 1
+        return ai_response, None
+
+    async def _complete(self, prompt: str, message: str, temperature: float, role: str,
+                        follow_up: List[Dict[str, str]] = None) -> str:
+        """Run a single completion on the client's event loop"""
+        try:
+            request_args = self._request_args(prompt, message, temperature, role, follow_up=follow_up)
+
+            async with self._in_flight:
+                response = await self.client.chat.completions.create(**request_args)
+
             print(f"\nAPI Response received", flush=True)
             ai_response = response.choices[0].message.content
             print(f"AI Response: {(ai_response)}", flush=True)
             return ai_response
-            
-        except APIConnectionError as e:
+
+        except Exception as e:
+            raise self._api_error(e)
+
+    async def _stream_into(self, chunks: queue.Queue, prompt: str, message: str, temperature: float, role: str):
+        """Run a streaming completion on the client's event loop, feeding deltas into a queue"""
+        # Streams aren't coalesced, so each one is an upstream call of its own
+        self.requests += 1
+        self.upstream_calls += 1
+        try:
+            request_args = self._request_args(prompt, message, temperature, role, stream=True)
+
+            async with self._in_flight:
+                stream = await self.client.chat.completions.create(**request_args)
+                print("\nAPI Stream opened", flush=True)
+                async for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        chunks.put(delta)
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            chunks.put(self._api_error(e))
+        finally:
+            chunks.put(_STREAM_END)
+
+    def _api_error(self, e: Exception) -> Exception:
+        """Log an upstream failure and convert it to the exception raised to callers"""
+        if isinstance(e, APIConnectionError) and not isinstance(e, APITimeoutError):
             error_msg = f"Failed to connect to API: {str(e)}"
             print(f"\nAPI CONNECTION ERROR: {error_msg}", flush=True)
-            print(f"Traceback: {traceback.format_exc()}", flush=True)
-            raise Exception(error_msg)
-        
-        except APITimeoutError as e:
+        elif isinstance(e, APITimeoutError):
             error_msg = f"API request timed out: {str(e)}"
             print(f"\nAPI TIMEOUT ERROR: {error_msg}", flush=True)
-            print(f"Traceback: {traceback.format_exc()}", flush=True)
-            raise Exception(error_msg)
-        
-        except RateLimitError as e:
+        elif isinstance(e, RateLimitError):
             error_msg = f"API rate limit exceeded: {str(e)}"
             print(f"\nRATE LIMIT ERROR: {error_msg}", flush=True)
-            print(f"Traceback: {traceback.format_exc()}", flush=True)
-            raise Exception(error_msg)
-        
-        except APIError as e:
+        elif isinstance(e, APIError):
             error_msg = f"API returned an error: {str(e)}"
             print(f"\nAPI ERROR: {error_msg}", flush=True)
-            print(f"Traceback: {traceback.format_exc()}", flush=True)
-            raise Exception(error_msg)
-        
-        except Exception as e:
+        else:
             error_msg = f"Unexpected error in LLM client: {str(e)}"
             print(f"\nUNEXPECTED ERROR: {error_msg}", flush=True)
-            print(f"Traceback: {traceback.format_exc()}", flush=True)
-            raise Exception(error_msg)
\ No newline at end of file
+        print(f"Traceback: {traceback.format_exc()}", flush=True)
+        return Exception(error_msg)
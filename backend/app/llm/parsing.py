@@ -0,0 +1,123 @@
+import json
+from typing import Callable, List, Optional
+
+# Feedback categories the tutor prompt asks for, with their empty values
+FEEDBACK_CATEGORIES = {
+    'unfamiliar_words': list,
+    'grammar_errors': dict,
+    'wrong_expressions': dict,
+    'best_fit_words': dict
+}
+
+_decoder = json.JSONDecoder()
+
+
+def empty_feedback() -> dict:
+    return {category: empty() for category, empty in FEEDBACK_CATEGORIES.items()}
+
+
+def extract_json_object(text: str, accept: Callable[[dict], bool] = None) -> Optional[dict]:
+    """
+    Find the first JSON object in text that `accept` (if given) agrees to.
+
+    Scans forward from each '{' and decodes in place, so code fences, leading
+    chatter and trailing prose around the object don't matter. An object that
+    decodes but isn't accepted is skipped whole, nested objects included.
+    """
+    start = text.find('{')
+    while start != -1:
+        try:
+            value, end = _decoder.raw_decode(text, start)
+        except ValueError:
+            start = text.find('{', start + 1)
+            continue
+        if isinstance(value, dict) and (accept is None or accept(value)):
+            return value
+        start = text.find('{', end)
+    return None
+
+
+def needs_correction(feedback: dict) -> bool:
+    """Whether any feedback category has entries"""
+    return any(feedback.get(category) for category in FEEDBACK_CATEGORIES)
+
+
+def tutor_schema_errors(parsed: dict) -> List[str]:
+    """Ways a parsed tutor reply departs from the format the tutor prompt asks for"""
+    errors = []
+    feedback = parsed.get('feedback')
+    if not isinstance(feedback, dict):
+        errors.append('"feedback" must be an object')
+    else:
+        for category, empty in FEEDBACK_CATEGORIES.items():
+            kind = 'an array' if empty is list else 'an object'
+            if category not in feedback:
+                errors.append(f'"feedback.{category}" is missing')
+            elif not isinstance(feedback[category], empty):
+                errors.append(f'"feedback.{category}" must be {kind}')
+        words = feedback.get('unfamiliar_words')
+        if isinstance(words, list) and not all(isinstance(word, str) for word in words):
+            errors.append('"feedback.unfamiliar_words" must contain only strings')
+    message = parsed.get('tutor_message')
+    if not isinstance(message, str) or not message.strip():
+        errors.append('"tutor_message" must be a non-empty string')
+    return errors
+
+
+def parse_tutor_json(response: str) -> dict:
+    """
+    Strictly parse a tutor reply into {"feedback", "tutor_message", "needs_correction"}.
+
+    Raises ValueError describing what's wrong if the reply has no JSON object or
+    doesn't match the tutor schema.
+    """
+    parsed = extract_json_object(response)
+    if parsed is None:
+        raise ValueError("the reply does not contain a JSON object")
+    errors = tutor_schema_errors(parsed)
+    if errors:
+        raise ValueError("; ".join(errors))
+    return {
+        "feedback": parsed['feedback'],
+        "tutor_message": parsed['tutor_message'],
+        "needs_correction": needs_correction(parsed['feedback'])
+    }
+
+
+def parse_tutor_response(response: str) -> dict:
+    """
+    Parse a tutor response into {"feedback", "tutor_message", "needs_correction"}.
+
+    feedback is the parsed dict. Unparseable responses get empty feedback and
+    no tutor_message.
+    """
+    # Some models answer with a bare "tutor_message: ..." line instead of JSON
+    if response.startswith("tutor_message:"):
+        return {
+            "feedback": empty_feedback(),
+            "tutor_message": response[len("tutor_message:"):].strip(),
+            "needs_correction": False
+        }
+
+    parsed = extract_json_object(response, lambda value: 'feedback' in value)
+    if parsed is None or not isinstance(parsed['feedback'], dict):
+        print("Failed to find tutor feedback JSON in response", flush=True)
+        return {
+            "feedback": empty_feedback(),
+            "needs_correction": False
+        }
+
+    return {
+        "feedback": parsed['feedback'],
+        "tutor_message": parsed.get('tutor_message'),
+        "needs_correction": needs_correction(parsed['feedback'])
+    }
+
+
+def parse_partner_response(response: str) -> dict:
+    """Parse a partner response into {"message"}; plain-text replies are used as-is"""
+    if '{' in response:
+        parsed = extract_json_object(response, lambda value: 'message' in value)
+        if parsed is not None:
+            return {"message": parsed['message']}
+    return {"message": response.strip()}
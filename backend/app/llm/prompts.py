@@ -1,3 +1,94 @@
+import math
+import logging
+from typing import List, Optional
+from config import Config
+
+try:
+    import tiktoken
+except ImportError:  # Token counts fall back to a character-based estimate
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# Rough characters-per-token ratio for English text, used when tiktoken is unavailable
+CHARS_PER_TOKEN = 4
+
+_encoding = None
+_encoding_loaded = False
+
+
+def load_encoding():
+    """
+    Load the tokenizer for the configured model; None if it can't be loaded.
+
+    tiktoken may download the encoding file the first time (into TIKTOKEN_CACHE_DIR
+    if set), so create_app calls this at startup rather than leaving it to the first
+    request. Only the first call does any work.
+    """
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        if tiktoken is not None:
+            try:
+                _encoding = tiktoken.encoding_for_model(Config.LLM_MODEL)
+            except Exception as e:
+                # Unknown model or the encoding file can't be fetched; estimate instead
+                logger.warning(f"Falling back to estimated token counts: {str(e)}")
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """Number of tokens the model will see for the given text"""
+    if not text:
+        return 0
+    encoding = load_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text down to at most max_tokens tokens"""
+    if count_tokens(text) <= max_tokens:
+        return text
+    encoding = load_encoding()
+    if encoding is not None:
+        return encoding.decode(encoding.encode(text)[:max_tokens])
+    return text[:max_tokens * CHARS_PER_TOKEN]
+
+
+def fit_history(messages: List[dict], max_tokens: int) -> str:
+    """
+    Render conversation messages as "role: text" lines, keeping the newest turns
+    that fit in max_tokens. Output stays in chronological order.
+    """
+    lines = []
+    used = 0
+    for msg in reversed(messages):
+        line = f"{msg['role']}: {msg['text']}"
+        # +1 for the newline joining this line to the next
+        cost = count_tokens(line) + 1
+        if used + cost > max_tokens:
+            break
+        lines.append(line)
+        used += cost
+    lines.reverse()
+    return "\n".join(lines)
+
+
+def count_oldest_turns(messages: List[dict], max_tokens: int) -> int:
+    """
+    How many of the oldest messages fit in max_tokens when rendered as by fit_history
+    (always at least one, so a single oversized turn can't stall the summary).
+    """
+    used = 0
+    for count, msg in enumerate(messages):
+        used += count_tokens(f"{msg['role']}: {msg['text']}") + 1
+        if used > max_tokens:
+            return max(count, 1)
+    return len(messages)
+
+
 class Prompts:
     CONVERSATION_TEMPLATE = """
     Scene: {scene_description}
@@ -32,7 +123,14 @@ class Prompts:
     """
 
     @staticmethod
-    def generate_tutor_prompt(user_level: str, scene_context: str, conversation_history: str, user_input: str, first_language: str = "zh") -> str:
+    def generate_tutor_prompt(user_level: str, scene_context: str, conversation_history: List[dict], user_input: str,
+                              first_language: str = "zh", history_token_budget: Optional[int] = None,
+                              summary: Optional[str] = None) -> str:
+        """
+        Build the tutor system prompt. The instructions and JSON schema are always kept
+        intact; conversation history gets the newest turns that fit the tutor's token budget,
+        preceded by the rolling summary of earlier turns if there is one.
+        """
         language_map = {
             "zh": "Chinese",
             "es": "Spanish",
@@ -44,6 +142,9 @@ class Prompts:
             "ko": "Korean"
         }
         feedback_language = language_map.get(first_language, "Chinese")
+        budget = Config.TUTOR_HISTORY_TOKEN_BUDGET if history_token_budget is None else history_token_budget
+        conversation_history = Prompts.format_history(conversation_history, budget, summary)
+        user_input = truncate_to_tokens(user_input, Config.USER_MESSAGE_TOKEN_LIMIT)
         
         return f"""You are an English language tutor. The user's English level is {user_level}. 
             Now based on the scene {scene_context}, conversation history {conversation_history} and user input {user_input}, 
@@ -76,7 +177,11 @@ class Prompts:
     #     return Prompts.ANALYSIS_TEMPLATE.format(text=text)
 
     @staticmethod
-    def generate_partner_prompt(user_level: str, scene, conversation_history):
+    def generate_partner_prompt(user_level: str, scene, conversation_history: List[dict],
+                                history_token_budget: Optional[int] = None, summary: Optional[str] = None):
+        """Build the partner system prompt, fitting history into the partner's token budget"""
+        budget = Config.PARTNER_HISTORY_TOKEN_BUDGET if history_token_budget is None else history_token_budget
+        conversation_history = Prompts.format_history(conversation_history, budget, summary)
         return f"""You are a conversation partner. Engage in natural dialogue based on this scene:
 
         Scene: {scene['title']}
@@ -90,4 +195,31 @@ class Prompts:
 
         Reply briefly but meaningfully. Keep the conversation flowing and engaging.
         """
- 
\ No newline at end of file
+
+    @staticmethod
+    def format_history(messages: List[dict], max_tokens: int, summary: Optional[str] = None) -> str:
+        """Recent turns fitted to max_tokens, preceded by the rolling summary of earlier turns"""
+        recent = fit_history(messages, max_tokens)
+        if not summary:
+            return recent
+        return f"Summary of the earlier conversation: {summary}\n{recent}"
+
+    @staticmethod
+    def generate_summary_prompt(previous_summary: Optional[str], messages: List[dict]) -> str:
+        """
+        Prompt asking the model to fold older turns into the rolling summary. Every
+        message is included, so callers must size the batch with count_oldest_turns.
+        """
+        new_turns = "\n".join(f"{msg['role']}: {msg['text']}" for msg in messages)
+        return f"""You maintain a running summary of an English practice conversation between a learner (user) and a conversation partner (assistant).
+
+        Current summary:
+        {previous_summary or "(none yet)"}
+
+        New turns to fold into the summary:
+        {new_turns}
+
+        Write an updated summary in English of at most {Config.SUMMARY_MAX_WORDS} words. Keep the facts, names,
+        choices and open questions the conversation depends on, and note recurring mistakes the learner makes.
+        Respond with the summary text only.
+        """
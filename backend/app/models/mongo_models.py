@@ -46,7 +46,12 @@ class ConversationSession(MongoModel):
         self.scene_id = scene_id
         self.started_at = started_at or datetime.utcnow()
         self.ended_at = ended_at
-        self.messages = []
+        # Updated on every message; idle sessions are moved to conversation_archive
+        self.last_activity_at = self.started_at
+        # Messages live in MessageBucket documents; the session only keeps their count
+        self.message_count = 0
+        self.summary = None
+        self.summarized_count = 0
         self.learning_points = {
             'unfamiliar_words': [],
             'grammar_errors': [],
@@ -54,15 +59,6 @@ class ConversationSession(MongoModel):
             'best_fit_words': []
         }
 
-    def add_message(self, role, text, timestamp=None):
-        message = {
-            'role': role,
-            'text': text,
-            'timestamp': timestamp or datetime.utcnow()
-        }
-        self.messages.append(message)
-        return message
-
     def add_learning_point(self, category, data):
         if category in self.learning_points:
             data['timestamp'] = datetime.utcnow()
@@ -77,10 +73,52 @@ class ConversationSession(MongoModel):
             'scene_id': self.scene_id,
             'started_at': self.started_at,
             'ended_at': self.ended_at,
-            'messages': self.messages,
+            'last_activity_at': self.last_activity_at,
+            'message_count': self.message_count,
+            'summary': self.summary,
+            'summarized_count': self.summarized_count,
             'learning_points': self.learning_points
         }
 
+class MessageBucket(MongoModel):
+    """
+    A fixed-size slice of a session's messages. Bucket `seq` holds the messages
+    with index seq * SIZE up to (seq + 1) * SIZE - 1.
+    """
+    # Changing this requires re-bucketing existing sessions
+    SIZE = 100
+
+    def __init__(self, session_id, seq, messages=None, count=0, created_at=None, _id=None):
+        self._id = _id or ObjectId()
+        self.session_id = session_id
+        self.seq = seq
+        self.messages = messages or []
+        self.count = count
+        self.created_at = created_at or datetime.utcnow()
+
+    @classmethod
+    def seq_for(cls, index):
+        return index // cls.SIZE
+
+    @staticmethod
+    def make_message(index, role, text, timestamp=None):
+        return {
+            'index': index,
+            'role': role,
+            'text': text,
+            'timestamp': timestamp or datetime.utcnow()
+        }
+
+    def to_dict(self):
+        return {
+            '_id': self._id,
+            'session_id': self.session_id,
+            'seq': self.seq,
+            'messages': self.messages,
+            'count': self.count,
+            'created_at': self.created_at
+        }
+
 class CompletedScene(MongoModel):
     def __init__(self, user_uid, scene_id, completed_at=None, score=None, feedback=None):
         self.user_uid = user_uid
@@ -116,13 +154,19 @@ class Topic(MongoModel):
         }
 
 class Scene(MongoModel):
-    def __init__(self, name, topic_id, description=None, icon_path=None, parent_id=None, created_at=None, _id=None):
+    def __init__(self, name, topic_id, description=None, icon_path=None, parent_id=None,
+                 ancestors=None, path=None, depth=0, created_at=None, _id=None):
         self._id = _id or ObjectId()
         self.name = name
         self.description = description
         self.icon_path = icon_path
         self.topic_id = topic_id
         self.parent_id = parent_id
+        # Materialized hierarchy (see app.scene_tree): [{_id, name}] from the root down,
+        # the ids from the root down to this scene, and the distance from the root
+        self.ancestors = ancestors or []
+        self.path = path or str(self._id)
+        self.depth = depth
         self.created_at = created_at or datetime.utcnow()
 
     def to_dict(self):
@@ -133,12 +177,16 @@ class Scene(MongoModel):
             'icon_path': self.icon_path,
             'topic_id': self.topic_id,
             'parent_id': self.parent_id,
+            'ancestors': self.ancestors,
+            'path': self.path,
+            'depth': self.depth,
             'created_at': self.created_at
         }
 
 class SceneLevel(MongoModel):
     def __init__(self, scene_id, english_level, example_dialogs=None, key_phrases=None, 
-                 vocabulary=None, grammar_points=None, created_at=None, _id=None):
+                 vocabulary=None, grammar_points=None, opening_remarks_text=None,
+                 opening_remarks_audio_path=None, created_at=None, _id=None):
         self._id = _id or ObjectId()
         self.scene_id = scene_id
         self.english_level = english_level
@@ -146,6 +194,9 @@ class SceneLevel(MongoModel):
         self.key_phrases = key_phrases
         self.vocabulary = vocabulary
         self.grammar_points = grammar_points
+        self.opening_remarks_text = opening_remarks_text
+        # Rendered from opening_remarks_text by scripts/render_opening_remarks.py
+        self.opening_remarks_audio_path = opening_remarks_audio_path
         self.created_at = created_at or datetime.utcnow()
 
     def to_dict(self):
@@ -157,6 +208,8 @@ class SceneLevel(MongoModel):
             'key_phrases': self.key_phrases,
             'vocabulary': self.vocabulary,
             'grammar_points': self.grammar_points,
+            'opening_remarks_text': self.opening_remarks_text,
+            'opening_remarks_audio_path': self.opening_remarks_audio_path,
             'created_at': self.created_at
         }
 
@@ -0,0 +1,64 @@
+from typing import Dict, List, Optional, Tuple
+from bson import ObjectId
+from bson.errors import InvalidId
+from flask import request
+from config import Config
+
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+
+
+class PageArgsError(ValueError):
+    """Invalid limit, after or fields query parameter"""
+
+
+def page_args(fields: Dict[str, str]) -> Tuple[int, Optional[ObjectId], List[str]]:
+    """
+    Read ?limit=, ?after= and ?fields= from the request.
+
+    fields maps response field names to document fields. Returns the page size
+    (default CATALOG_PAGE_SIZE, at most CATALOG_MAX_PAGE_SIZE), the cursor to start
+    after, and the response fields to include ('id' always is).
+    """
+    try:
+        limit = int(request.args.get('limit', Config.CATALOG_PAGE_SIZE))
+    except ValueError:
+        raise PageArgsError("limit must be an integer")
+    if limit < 1:
+        raise PageArgsError("limit must be at least 1")
+    limit = min(limit, Config.CATALOG_MAX_PAGE_SIZE)
+
+    after = request.args.get('after')
+    if after:
+        try:
+            after = ObjectId(after)
+        except (InvalidId, TypeError):
+            raise PageArgsError("after must be a cursor returned in X-Next-Cursor")
+    else:
+        after = None
+
+    requested = [name.strip() for name in request.args.get('fields', '').split(',') if name.strip()]
+    unknown = [name for name in requested if name not in fields]
+    if unknown:
+        raise PageArgsError(f"Unknown fields: {', '.join(unknown)}; available: {', '.join(fields)}")
+    selected = ['id'] + [name for name in requested if name != 'id'] if requested else list(fields)
+    return limit, after, selected
+
+
+def find_page(collection, query: dict, limit: int, after: Optional[ObjectId], fields: Dict[str, str],
+              selected: List[str]) -> Tuple[List[dict], Optional[str]]:
+    """
+    One page of documents in _id order, starting after the cursor (keyset pagination,
+    so every page costs the same however deep it is). Returns the documents shaped as
+    the selected response fields, and the cursor for the next page or None on the last.
+    """
+    if after is not None:
+        query = {**query, '_id': {'$gt': after}}
+    projection = {fields[name]: 1 for name in selected}
+    docs = list(collection.find(query, projection, sort=[('_id', 1)], limit=limit + 1))
+
+    next_cursor = str(docs[limit - 1]['_id']) if len(docs) > limit else None
+    items = [{
+        name: str(doc['_id']) if name == 'id' else doc.get(fields[name])
+        for name in selected
+    } for doc in docs[:limit]]
+    return items, next_cursor
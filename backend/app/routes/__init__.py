@@ -7,8 +7,11 @@ from .scene import bp as scene_bp
 from .conversation import bp as conversation_bp
 from .learning import bp as learning_bp
 from .config import bp as config_bp  # Now importing from the config package
+from .metrics import bp as metrics_bp
+from .conversation_socket import bp as conversation_socket_bp
+from .tts import bp as tts_bp
 
-__all__ = ['user_bp', 'scene_bp', 'conversation_bp', 'learning_bp', 'config_bp']
+__all__ = ['user_bp', 'scene_bp', 'conversation_bp', 'learning_bp', 'config_bp', 'metrics_bp', 'conversation_socket_bp', 'tts_bp']
 
 # Remove these routes since we removed the main blueprint
 # @main.route('/')
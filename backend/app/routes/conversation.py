@@ -1,16 +1,24 @@
-from flask import jsonify, request, current_app, Blueprint
+from flask import jsonify, request, current_app, Blueprint, Response, stream_with_context
+import asyncio
 import json
 from app.extensions import mongo
 from app.models.mongo_models import ConversationSession, Scene, SceneLevel
 from app.llm.client import LLMClient
 from app.llm.prompts import Prompts
+from app.llm.parsing import parse_tutor_json, parse_tutor_response, parse_partner_response
 from app.auth import verify_token, verify_same_user
+from app.idempotency import idempotent
+from app.tutor_jobs import tutor_jobs, QueueFull
+from app.cache import create_cache, fingerprint, normalize_text
+from app.catalog import scene_cache
+from app.conversation_store import load_history, append_message, end_session
+from app.summarizer import maybe_schedule_summary
+from app.learning_store import persist_feedback
+from app import background
+from config import Config
 import logging
-import re
 import traceback
 from typing import List
-from bson import ObjectId
-from datetime import datetime
 
 # Set up logger
 logger = logging.getLogger(__name__)
@@ -18,203 +26,183 @@ logger = logging.getLogger(__name__)
 print("Creating LLM client instance")  # Debug print
 llm_client = LLMClient()
 
+tutor_cache = create_cache(
+    Config.TUTOR_CACHE_BACKEND,
+    collection_name='tutor_response_cache',
+    max_size=Config.TUTOR_CACHE_MAX_SIZE,
+    ttl=Config.TUTOR_CACHE_TTL
+)
+
 # Create blueprint with url_prefix
 bp = Blueprint('conversation', __name__, url_prefix='/api')
 
 
-def extract_tutor_feedback(response: str) -> dict:
-    """Extract feedback JSON from tutor response"""
-    import json
-    import re
+def tutor_cache_key(scene_id, level, first_language, user_input, previous_messages) -> str:
+    """Cache key for tutor feedback: scene, level, language, normalized input and recent history"""
+    recent = previous_messages[-Config.TUTOR_CACHE_HISTORY_MESSAGES:] if Config.TUTOR_CACHE_HISTORY_MESSAGES > 0 else []
+    history_fingerprint = fingerprint(*[f"{msg['role']}:{normalize_text(msg['text'])}" for msg in recent])
+    return fingerprint(
+        str(scene_id),
+        level.upper(),
+        first_language,
+        normalize_text(user_input),
+        history_fingerprint
+    )
+
+def load_session_history(session_id, limit):
+    """Get the session's rolling summary and its last `limit` unsummarized messages"""
+    return load_history(session_id, limit)
+
+def load_scene_data(scene_id, user_level):
+    """Get the scene and its level shaped for the prompt builders (served from the scene cache)"""
+    return scene_cache.get_scene_data(scene_id, user_level)
+
+def save_message(session_id, role, text):
+    """
+    Append a message to the session, folding older turns into its summary when due.
+    Returns the session's message counters after the append, or None if it doesn't exist.
+    """
+    counts = append_message(session_id, role, text)
+    if counts:
+        maybe_schedule_summary(llm_client, session_id, counts.get('message_count', 0), counts.get('summarized_count'))
+    return counts
+
+def format_sse(event: str, data: dict) -> str:
+    """Format a single Server-Sent Events frame"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def tutor_response(feedback: dict) -> dict:
+    """Tutor feedback as clients expect it, with the feedback categories as a JSON string"""
+    return {**feedback, "feedback": json.dumps(feedback['feedback'])}
+
+def record_learning_points(feedback, session_id, user_uid, user_input):
+    """Store the feedback's learning points in the learning collections, off the response path"""
+    if feedback.get('needs_correction'):
+        background.submit(persist_feedback, feedback['feedback'], session_id, user_uid, user_input)
+
+async def generate_tutor_feedback(session_id, scene_id, history, user_input, user_uid, first_language="zh", scene_data=None) -> dict:
+    """
+    Get parsed tutor feedback for the latest user message and record its learning points.
+    The feedback stays a dict here; tutor_response() shapes it for clients.
+
+    history is the session's ConversationHistory, whose messages end with that message.
+    scene_data is loaded on a cache miss if the caller hasn't already loaded it.
+    """
+    user_level = "B1"  # TODO: Get actual user level
     
-    print(f"Attempting to extract tutor feedback from response of length {len(response)}", flush=True)
+    # Common utterances in the same scene and context get the same feedback, so
+    # serve them from the cache before building the prompt or calling the LLM
+    cache_key = tutor_cache_key(scene_id, user_level, first_language, user_input, history.messages[:-1])
+    cached_response = tutor_cache.get(cache_key)
+    if cached_response is not None:
+        print("Tutor feedback served from cache", flush=True)
+        feedback = parse_tutor_response(cached_response)
+        record_learning_points(feedback, session_id, user_uid, user_input)
+        return feedback
     
-    # If response starts with "tutor_message:", try to convert to JSON
-    if response.startswith("tutor_message:"):
-        message = response.replace("tutor_message:", "").strip()
-        return {
-            "feedback": json.dumps({
-                "unfamiliar_words": [],
-                "grammar_errors": {},
-                "wrong_expressions": {},
-                "best_fit_words": {}
-            }),
-            "tutor_message": message,
-            "needs_correction": False
-        }
+    if scene_data is None:
+        scene_data = load_scene_data(scene_id, user_level)
     
-    # First try: Extract JSON from markdown code block
-    code_block_match = re.search(r'```json\s*(\{.*?\})\s*```', response, re.DOTALL)
-    if code_block_match:
-        try:
-            json_str = code_block_match.group(1)
-            parsed_json = json.loads(json_str)
-            if 'feedback' in parsed_json:
-                return {
-                    "feedback": json.dumps(parsed_json['feedback']),
-                    "tutor_message": parsed_json['tutor_message'],
-                    "needs_correction": any([
-                        len(parsed_json['feedback'].get('unfamiliar_words', [])) > 0,
-                        len(parsed_json['feedback'].get('grammar_errors', {})) > 0,
-                        len(parsed_json['feedback'].get('wrong_expressions', {})) > 0,
-                        len(parsed_json['feedback'].get('best_fit_words', {})) > 0
-                    ])
-                }
-        except json.JSONDecodeError:
-            print("Failed to parse JSON from code block", flush=True)
+    # Generate tutor prompt
+    prompt = Prompts.generate_tutor_prompt(
+        user_level=user_level,
+        scene_context=scene_data,
+        conversation_history=history.messages,
+        user_input=user_input,
+        first_language=first_language,
+        summary=history.summary
+    )
     
-    # Second try: Parse the entire response as JSON
-    try:
-        parsed_json = json.loads(response)
-        if 'feedback' in parsed_json:
-            return {
-                "feedback": json.dumps(parsed_json['feedback']),
-                "tutor_message": parsed_json['tutor_message'],
-                "needs_correction": any([
-                    len(parsed_json['feedback'].get('unfamiliar_words', [])) > 0,
-                    len(parsed_json['feedback'].get('grammar_errors', {})) > 0,
-                    len(parsed_json['feedback'].get('wrong_expressions', {})) > 0,
-                    len(parsed_json['feedback'].get('best_fit_words', {})) > 0
-                ])
-            }
-    except json.JSONDecodeError:
-        print("Failed to parse entire response as JSON", flush=True)
+    # Get AI response, re-asked once if it doesn't match the feedback schema
+    ai_response, feedback = await llm_client.acomplete_structured(prompt, user_input, parse_tutor_json, role="tutor")
+    print(f"\n=== LLM TUTOR RESPONSE ===\n{ai_response}\n===================\n", flush=True)
     
-    # Fallback
-    return {
-        "feedback": json.dumps({
-            "unfamiliar_words": [],
-            "grammar_errors": {},
-            "wrong_expressions": {},
-            "best_fit_words": {}
-        }),
-        "needs_correction": False
-    }
+    # Only cache responses that parsed into real feedback
+    if feedback is not None:
+        tutor_cache.set(cache_key, ai_response)
+    else:
+        feedback = parse_tutor_response(ai_response)
+    
+    record_learning_points(feedback, session_id, user_uid, user_input)
+    return feedback
 
-def extract_partner_message(response: str) -> dict:
-    """Extract message from partner response"""
-    import json
+async def generate_partner_reply(session_id, history, scene_data, user_input, user_level) -> dict:
+    """Get the partner's reply and save it to the session"""
+    prompt = Prompts.generate_partner_prompt(
+        user_level=user_level,
+        scene=scene_data,
+        conversation_history=history.messages,
+        summary=history.summary
+    )
     
-    print(f"Attempting to extract partner message from response of length {len(response)}", flush=True)
+    # Get AI response
+    ai_response = await llm_client.acomplete(prompt, user_input, role="partner")
+    print(f"\n=== LLM PARTNER RESPONSE ===\n{ai_response}\n===================\n", flush=True)
     
-    try:
-        # Try to parse as JSON first in case it's wrapped
-        parsed_json = json.loads(response)
-        if isinstance(parsed_json, dict) and 'message' in parsed_json:
-            return {"message": parsed_json['message']}
-    except json.JSONDecodeError:
-        # If it's not JSON, use the raw response as the message
-        return {"message": response.strip()}
-
-def handle_tutor_feedback(session_id, scene_id, user_input, first_language="zh"):
+    # Parse message using partner-specific function
+    response_data = parse_partner_response(ai_response)
+    
+    # Save AI message to session
+    save_message(session_id, 'assistant', response_data['message'])
+    
+    return response_data
+
+async def handle_tutor_feedback(session_id, scene_id, user_input, user_uid, first_language="zh"):
     """Process feedback from the tutor"""
     try:
-        # Get conversation history
-        session = mongo.db.conversation_sessions.find_one({'_id': ObjectId(session_id)})
-        if not session:
-            raise ValueError("Session not found")
-            
-        messages = session.get('messages', [])
-        conversation_history = "\n".join([f"{msg['role']}: {msg['text']}" for msg in messages])
-        
-        # Get scene info
-        scene = mongo.db.scenes.find_one({'_id': ObjectId(scene_id)})
-        if not scene:
-            raise ValueError("Scene not found")
-            
-        # Get scene level info
-        scene_level = mongo.db.scene_levels.find_one({
-            'scene_id': ObjectId(scene_id),
-            'english_level': 'B1'  # TODO: Get actual user level
-        })
-        
-        # Prepare scene info for tutor prompt
-        scene_info = {
-            "title": scene['name'],
-            "description": scene.get('description'),
-            "vocabulary": scene_level.get('vocabulary', '').split(',') if scene_level and scene_level.get('vocabulary') else [],
-            "phrases": [],
-            "questions": []
-        }
-        
-        # Generate tutor prompt
-        prompt = Prompts.generate_tutor_prompt(
-            user_level="B1",  # TODO: Get actual user level
-            scene_context=scene_info,
-            conversation_history=conversation_history,
-            user_input=user_input,
-            first_language=first_language
-        )
-        
-        # Get AI response
-        ai_response = llm_client.get_completion(prompt, user_input, role="tutor")
-        print(f"\n=== LLM TUTOR RESPONSE ===\n{ai_response}\n===================\n", flush=True)
-        
-        # Parse feedback using tutor-specific function
-        return jsonify(extract_tutor_feedback(ai_response))
+        history = load_session_history(session_id, Config.TUTOR_HISTORY_MESSAGES)
+        return jsonify(tutor_response(await generate_tutor_feedback(session_id, scene_id, history, user_input, user_uid, first_language)))
 
     except Exception as e:
         print(f"Error in tutor feedback: {str(e)}", flush=True)
         raise
 
-def handle_partner_chat(session_id, scene_id, user_input, user_level):
+def enqueue_tutor_feedback(session_id, scene_id, user_input, user_uid, first_language="zh"):
+    """Queue tutor feedback as a job and return 202 with its id instead of waiting for the LLM"""
+    # Read history now, while the user's message is still the session's last one
+    history = load_session_history(session_id, Config.TUTOR_HISTORY_MESSAGES)
+
+    def work():
+        return tutor_response(asyncio.run(
+            generate_tutor_feedback(session_id, scene_id, history, user_input, user_uid, first_language)
+        ))
+
+    try:
+        job_id = tutor_jobs.submit(user_uid, session_id, work)
+    except QueueFull as e:
+        response = jsonify({"error": str(e)})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+
+    response = jsonify({"job_id": job_id, "status": "pending"})
+    response.headers['Location'] = f"/api/conversation/tutor/jobs/{job_id}"
+    return response, 202
+
+def job_to_dict(job) -> dict:
+    return {
+        "job_id": str(job['_id']),
+        "session_id": job.get('session_id'),
+        "status": job['status'],
+        "result": job.get('result'),
+        "error": job.get('error'),
+        "created_at": job['created_at'].isoformat(),
+        "completed_at": job['completed_at'].isoformat() if job.get('completed_at') else None
+    }
+
+def requested_wait() -> float:
+    """The ?wait= long-poll time in seconds, capped at TUTOR_JOB_MAX_WAIT"""
+    try:
+        wait = float(request.args.get('wait', 0))
+    except ValueError:
+        wait = 0
+    return max(0.0, min(wait, Config.TUTOR_JOB_MAX_WAIT))
+
+async def handle_partner_chat(session_id, scene_id, user_input, user_level):
     """Process chat with the conversation partner"""
     try:
-        # Get conversation history
-        session = mongo.db.conversation_sessions.find_one({'_id': ObjectId(session_id)})
-        if not session:
-            raise ValueError("Session not found")
-            
-        messages = session.get('messages', [])
-        conversation_history = "\n".join([f"{msg['role']}: {msg['text']}" for msg in messages])
-        
-        # Get scene info
-        scene = mongo.db.scenes.find_one({'_id': ObjectId(scene_id)})
-        if not scene:
-            raise ValueError("Scene not found")
-            
-        # Get scene level info
-        scene_level = mongo.db.scene_levels.find_one({
-            'scene_id': ObjectId(scene_id),
-            'english_level': user_level.upper()
-        })
-        
-        # Prepare scene data for prompt
-        scene_data = {
-            "title": scene['name'],
-            "description": scene.get('description'),
-            "vocabulary": scene_level.get('vocabulary', '').split(',') if scene_level and scene_level.get('vocabulary') else [],
-            "phrases": [],
-            "questions": []
-        }
-        
-        # Generate partner prompt
-        prompt = Prompts.generate_partner_prompt(
-            user_level=user_level,
-            scene=scene_data,
-            conversation_history=conversation_history
-        )
-        
-        # Get AI response
-        ai_response = llm_client.get_completion(prompt, user_input, role="partner")
-        print(f"\n=== LLM PARTNER RESPONSE ===\n{ai_response}\n===================\n", flush=True)
-        
-        # Parse message using partner-specific function
-        response_data = extract_partner_message(ai_response)
-        
-        # Save AI message to session
-        new_message = {
-            'role': 'assistant',
-            'text': response_data['message'],
-            'timestamp': datetime.utcnow()
-        }
-        
-        mongo.db.conversation_sessions.update_one(
-            {'_id': ObjectId(session_id)},
-            {'$push': {'messages': new_message}}
-        )
-        
-        return jsonify(response_data)
+        history = load_session_history(session_id, Config.PARTNER_HISTORY_MESSAGES)
+        scene_data = load_scene_data(scene_id, user_level)
+        return jsonify(await generate_partner_reply(session_id, history, scene_data, user_input, user_level))
 
     except Exception as e:
         print(f"Error in partner chat: {str(e)}", flush=True)
@@ -224,10 +212,123 @@ def handle_partner_chat(session_id, scene_id, user_input, user_level):
             "details": str(e)
         }), 500
 
+def turn_result(result) -> dict:
+    """Shape one half of a combined turn, reporting failures without failing the other half"""
+    if isinstance(result, Exception):
+        print(f"Error in conversation turn: {str(result)}", flush=True)
+        return {
+            "error": "An unexpected error occurred while processing your message.",
+            "details": str(result)
+        }
+    return result
+
+async def handle_turn(session_id, scene_id, user_input, user_uid, user_level, first_language="zh"):
+    """Save the user's message once, load context once, and run tutor and partner concurrently"""
+    save_message(session_id, 'user', user_input)
+    history = load_session_history(session_id, max(Config.TUTOR_HISTORY_MESSAGES, Config.PARTNER_HISTORY_MESSAGES))
+    tutor_history = history.tail(Config.TUTOR_HISTORY_MESSAGES)
+    partner_history = history.tail(Config.PARTNER_HISTORY_MESSAGES)
+    scene_data = load_scene_data(scene_id, user_level)
+    
+    tutor_result, partner_result = await asyncio.gather(
+        generate_tutor_feedback(session_id, scene_id, tutor_history, user_input, user_uid, first_language, scene_data),
+        generate_partner_reply(session_id, partner_history, scene_data, user_input, user_level),
+        return_exceptions=True
+    )
+    
+    status = 500 if isinstance(tutor_result, Exception) and isinstance(partner_result, Exception) else 200
+    return jsonify({
+        "tutor": turn_result(tutor_result if isinstance(tutor_result, Exception) else tutor_response(tutor_result)),
+        "partner": turn_result(partner_result)
+    }), status
+
+def stream_turn(session_id, scene_id, user_input, user_uid, user_level, first_language="zh"):
+    """Like handle_turn, but send the tutor and partner results as SSE frames as each finishes"""
+    save_message(session_id, 'user', user_input)
+    history = load_session_history(session_id, max(Config.TUTOR_HISTORY_MESSAGES, Config.PARTNER_HISTORY_MESSAGES))
+    tutor_history = history.tail(Config.TUTOR_HISTORY_MESSAGES)
+    partner_history = history.tail(Config.PARTNER_HISTORY_MESSAGES)
+    scene_data = load_scene_data(scene_id, user_level)
+
+    def generate():
+        loop = asyncio.new_event_loop()
+        try:
+            tasks = {
+                loop.create_task(generate_tutor_feedback(session_id, scene_id, tutor_history, user_input, user_uid, first_language, scene_data)): "tutor",
+                loop.create_task(generate_partner_reply(session_id, partner_history, scene_data, user_input, user_level)): "partner"
+            }
+            pending = set(tasks)
+            while pending:
+                done, pending = loop.run_until_complete(
+                    asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                )
+                for task in done:
+                    result = task.exception() or task.result()
+                    if tasks[task] == "tutor" and not isinstance(result, Exception):
+                        result = tutor_response(result)
+                    yield format_sse(tasks[task], turn_result(result))
+            yield format_sse("done", {})
+        finally:
+            for task in asyncio.all_tasks(loop):
+                task.cancel()
+            loop.close()
+
+    # The generator only touches mongo and the LLM client, so it doesn't need the request
+    # context (which can't be carried out of an async view anyway)
+    return Response(
+        generate(),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+def stream_partner_chat(session_id, scene_id, user_input, user_level):
+    """Stream the partner's reply as SSE frames and save it once complete"""
+    history = load_session_history(session_id, Config.PARTNER_HISTORY_MESSAGES)
+    prompt = Prompts.generate_partner_prompt(
+        user_level=user_level,
+        scene=load_scene_data(scene_id, user_level),
+        conversation_history=history.messages,
+        summary=history.summary
+    )
+
+    def generate():
+        parts = []
+        try:
+            for delta in llm_client.stream_completion(prompt, user_input, role="partner"):
+                parts.append(delta)
+                yield format_sse("token", {"delta": delta})
+        except Exception as e:
+            print(f"Error in partner stream: {str(e)}", flush=True)
+            print(f"Error details: {traceback.format_exc()}", flush=True)
+            yield format_sse("error", {
+                "error": "An unexpected error occurred while processing your message.",
+                "details": str(e)
+            })
+            return
+
+        ai_response = "".join(parts)
+        print(f"\n=== LLM PARTNER RESPONSE (streamed) ===\n{ai_response}\n===================\n", flush=True)
+        response_data = parse_partner_response(ai_response)
+        save_message(session_id, 'assistant', response_data['message'])
+        yield format_sse("done", response_data)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
 @bp.route('/conversation/tutor', methods=['POST'])
 @verify_token
 @verify_same_user
-def process_tutor_feedback():
+@idempotent
+async def process_tutor_feedback():
     print("\n=== TUTOR ENDPOINT CALLED ===", flush=True)
     data = request.get_json()
     print(f"Request data: {data}", flush=True)
@@ -243,20 +344,13 @@ def process_tutor_feedback():
     
     try:
         # Save user message
-        new_message = {
-            'role': 'user',
-            'text': data['user_input'],
-            'timestamp': datetime.utcnow()
-        }
-        
-        mongo.db.conversation_sessions.update_one(
-            {'_id': ObjectId(data['session_id'])},
-            {'$push': {'messages': new_message}}
-        )
+        save_message(data['session_id'], 'user', data['user_input'])
 
         # Get first_language from request data, default to "zh" if not provided
         first_language = data.get('first_language', 'zh')
-        return handle_tutor_feedback(data['session_id'], data['scene_id'], data['user_input'], first_language)
+        if data.get('async'):
+            return enqueue_tutor_feedback(data['session_id'], data['scene_id'], data['user_input'], data['uid'], first_language)
+        return await handle_tutor_feedback(data['session_id'], data['scene_id'], data['user_input'], data['uid'], first_language)
 
     except Exception as e:
         print(f"Unexpected error in tutor feedback: {str(e)}", flush=True)
@@ -266,10 +360,40 @@ def process_tutor_feedback():
             "details": str(e)
         }), 500
 
+@bp.route('/conversation/tutor/jobs/<job_id>', methods=['GET'])
+@verify_token
+def get_tutor_job(job_id):
+    """Get a tutor feedback job; ?wait=N long-polls up to N seconds for it to finish"""
+    try:
+        jobs = tutor_jobs.wait([job_id], request.user['uid'], requested_wait())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if not jobs:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job_to_dict(jobs[0]))
+
+@bp.route('/conversation/tutor/jobs', methods=['GET'])
+@verify_token
+def get_tutor_jobs():
+    """
+    Get several tutor feedback jobs: ?ids=a,b,c[&wait=N]. With wait, returns as soon as
+    any of them has finished (or after N seconds), so clients can collect results as
+    they complete.
+    """
+    job_ids = [job_id for job_id in request.args.get('ids', '').split(',') if job_id]
+    if not job_ids:
+        return jsonify({"error": "ids is required"}), 400
+    try:
+        jobs = tutor_jobs.wait(job_ids, request.user['uid'], requested_wait())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"jobs": [job_to_dict(job) for job in jobs]})
+
 @bp.route('/conversation/partner', methods=['POST'])
 @verify_token
 @verify_same_user
-def process_partner_message():
+@idempotent
+async def process_partner_message():
     print("\n=== PARTNER ENDPOINT CALLED ===", flush=True)
     data = request.get_json()
     print(f"Request data: {data}", flush=True)
@@ -284,7 +408,7 @@ def process_partner_message():
         return jsonify({"error": error_msg}), 400
     
     try:
-        return handle_partner_chat(data['session_id'], data['scene_id'], data['user_input'], "B1")
+        return await handle_partner_chat(data['session_id'], data['scene_id'], data['user_input'], "B1")
 
     except Exception as e:
         print(f"Unexpected error in partner chat: {str(e)}", flush=True)
@@ -294,6 +418,66 @@ def process_partner_message():
             "details": str(e)
         }), 500
 
+@bp.route('/conversation/partner/stream', methods=['POST'])
+@verify_token
+@verify_same_user
+def process_partner_message_stream():
+    print("\n=== PARTNER STREAM ENDPOINT CALLED ===", flush=True)
+    data = request.get_json()
+    print(f"Request data: {data}", flush=True)
+    
+    # Validate input data
+    required_fields = ['session_id', 'uid', 'scene_id', 'user_input']
+    missing_fields = [field for field in required_fields if field not in data]
+    
+    if missing_fields:
+        error_msg = f"Missing required fields: {', '.join(missing_fields)}"
+        print(f"ERROR: {error_msg}", flush=True)
+        return jsonify({"error": error_msg}), 400
+    
+    try:
+        return stream_partner_chat(data['session_id'], data['scene_id'], data['user_input'], "B1")
+
+    except Exception as e:
+        print(f"Unexpected error in partner stream: {str(e)}", flush=True)
+        print(f"Error details: {traceback.format_exc()}", flush=True)
+        return jsonify({
+            "error": "An unexpected error occurred while processing your message.",
+            "details": str(e)
+        }), 500
+
+@bp.route('/conversation/turn', methods=['POST'])
+@verify_token
+@verify_same_user
+@idempotent
+async def process_turn():
+    print("\n=== TURN ENDPOINT CALLED ===", flush=True)
+    data = request.get_json()
+    print(f"Request data: {data}", flush=True)
+    
+    # Validate input data
+    required_fields = ['session_id', 'uid', 'scene_id', 'user_input']
+    missing_fields = [field for field in required_fields if field not in data]
+    
+    if missing_fields:
+        error_msg = f"Missing required fields: {', '.join(missing_fields)}"
+        print(f"ERROR: {error_msg}", flush=True)
+        return jsonify({"error": error_msg}), 400
+    
+    try:
+        first_language = data.get('first_language', 'zh')
+        if data.get('stream'):
+            return stream_turn(data['session_id'], data['scene_id'], data['user_input'], data['uid'], "B1", first_language)
+        return await handle_turn(data['session_id'], data['scene_id'], data['user_input'], data['uid'], "B1", first_language)
+
+    except Exception as e:
+        print(f"Unexpected error in conversation turn: {str(e)}", flush=True)
+        print(f"Error details: {traceback.format_exc()}", flush=True)
+        return jsonify({
+            "error": "An unexpected error occurred while processing your message.",
+            "details": str(e)
+        }), 500
+
 @bp.route('/conversation/session', methods=['POST'])
 @verify_token
 @verify_same_user
@@ -321,6 +505,24 @@ def create_session():
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
+@bp.route('/conversation/session/<session_id>/end', methods=['POST'])
+@verify_token
+@verify_same_user
+def end_conversation_session(session_id):
+    data = request.get_json()
+    try:
+        session = end_session(session_id, data['uid'])
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+    if not session:
+        return jsonify({"error": "Session not found"}), 404
+    
+    return jsonify({
+        "id": str(session['_id']),
+        "ended_at": session['ended_at'].isoformat(),
+        "message_count": session.get('message_count', 0)
+    })
+
 def get_scene_vocabulary(scene: Scene) -> List[str]:
     """Get vocabulary for a scene from its scene levels"""
     scene_level = SceneLevel.query.filter_by(scene_id=scene.id).first()
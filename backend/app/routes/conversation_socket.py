@@ -0,0 +1,223 @@
+from flask import Blueprint, request
+from simple_websocket import ConnectionClosed
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import json
+import logging
+import traceback
+from bson import ObjectId
+from app.extensions import mongo, sock
+from app.auth import authenticate_token, token_error_message
+from app.conversation_store import ConversationHistory, load_summary
+from app.llm.prompts import Prompts
+from app.llm.parsing import parse_partner_response
+from app.routes.conversation import (
+    llm_client, load_session_history, load_scene_data, save_message,
+    generate_tutor_feedback, tutor_response
+)
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+bp = Blueprint('conversation_socket', __name__, url_prefix='/api')
+
+# Tutor feedback for socket turns runs here while the socket thread streams the partner
+tutor_executor = ThreadPoolExecutor(max_workers=Config.SOCKET_TUTOR_WORKERS, thread_name_prefix='socket-tutor')
+
+
+def send_frame(ws, frame_type: str, **data):
+    ws.send(json.dumps({"type": frame_type, **data}))
+
+
+def error_frame(ws, error: str, details: str = None, **data):
+    send_frame(ws, "error", error=error, details=details, **data)
+
+
+class SessionContext:
+    """
+    Conversation state kept in memory for the lifetime of one socket connection.
+
+    History and scene data are read once when the connection opens; after that each
+    turn's messages are saved to Mongo and appended here, so turns don't re-read them.
+    The summary is re-read only when the summarizer has folded in more messages, and
+    the messages it now covers are dropped, as load_history would.
+    """
+
+    def __init__(self, session_id, scene_id, user_uid, user_level, first_language):
+        self.session_id = session_id
+        self.scene_id = scene_id
+        self.user_uid = user_uid
+        self.user_level = user_level
+        self.first_language = first_language
+        self.window = max(Config.TUTOR_HISTORY_MESSAGES, Config.PARTNER_HISTORY_MESSAGES)
+        self.history = load_session_history(session_id, self.window)
+        self.scene_data = load_scene_data(scene_id, user_level)
+        self.summarized_count = load_summary(session_id)[1] if self.history.summary is not None else 0
+
+    def add_message(self, role: str, text: str):
+        counts = save_message(self.session_id, role, text)
+        if counts is None:
+            raise ValueError("Session not found")
+        summary = self.history.summary
+        if (counts.get('summarized_count') or 0) != self.summarized_count:
+            summary, self.summarized_count = load_summary(self.session_id)
+        messages = self.history.messages + [{'index': counts['message_count'] - 1, 'role': role, 'text': text}]
+        messages = [msg for msg in messages if msg['index'] >= self.summarized_count]
+        self.history = ConversationHistory(summary, messages[-self.window:])
+
+
+def authenticate(ws) -> dict:
+    """
+    Authenticate the connection once: from the Authorization header if the client sent
+    one, otherwise from a first {"type": "auth", "token": ...} frame.
+    """
+    auth_header = request.headers.get('Authorization', '')
+    if auth_header.startswith('Bearer '):
+        token = auth_header.split('Bearer ')[1]
+    else:
+        frame = ws.receive(timeout=Config.SOCKET_AUTH_TIMEOUT)
+        try:
+            message = json.loads(frame) if frame else {}
+        except json.JSONDecodeError:
+            message = {}
+        if message.get('type') != 'auth' or not message.get('token'):
+            raise PermissionError('No authorization provided')
+        token = message['token']
+
+    try:
+        return authenticate_token(token)
+    except Exception as e:
+        raise PermissionError(token_error_message(e))
+
+
+def run_tutor(context: SessionContext, history: ConversationHistory, user_input: str) -> dict:
+    return asyncio.run(generate_tutor_feedback(
+        context.session_id, context.scene_id, history, user_input, context.user_uid,
+        context.first_language, context.scene_data
+    ))
+
+
+def run_turn(ws, context: SessionContext, user_input: str, turn_id=None):
+    """
+    Run one turn: stream the partner's reply as partner_token frames and send the tutor's
+    feedback as soon as it's ready, then partner_done and turn_done.
+    """
+    try:
+        context.add_message('user', user_input)
+    except Exception as e:
+        print(f"Error saving socket message: {str(e)}", flush=True)
+        error_frame(ws, "Could not save your message.", str(e), turn_id=turn_id, source="store")
+        send_frame(ws, "turn_done", turn_id=turn_id)
+        return
+    tutor_future = tutor_executor.submit(
+        run_tutor, context, context.history.tail(Config.TUTOR_HISTORY_MESSAGES), user_input
+    )
+    tutor_sent = False
+
+    def send_tutor():
+        try:
+            send_frame(ws, "tutor_feedback", turn_id=turn_id, **tutor_response(tutor_future.result()))
+        except ConnectionClosed:
+            raise
+        except Exception as e:
+            print(f"Error in socket tutor feedback: {str(e)}", flush=True)
+            error_frame(ws, "An unexpected error occurred while processing your message.", str(e), turn_id=turn_id, source="tutor")
+
+    partner_history = context.history.tail(Config.PARTNER_HISTORY_MESSAGES)
+    prompt = Prompts.generate_partner_prompt(
+        user_level=context.user_level,
+        scene=context.scene_data,
+        conversation_history=partner_history.messages,
+        summary=partner_history.summary
+    )
+    parts = []
+    try:
+        for delta in llm_client.stream_completion(prompt, user_input, role="partner"):
+            parts.append(delta)
+            send_frame(ws, "partner_token", turn_id=turn_id, delta=delta)
+            # Only this thread writes to the socket, so the tutor frame goes out between tokens
+            if not tutor_sent and tutor_future.done():
+                send_tutor()
+                tutor_sent = True
+    except ConnectionClosed:
+        raise
+    except Exception as e:
+        print(f"Error in socket partner stream: {str(e)}", flush=True)
+        print(f"Error details: {traceback.format_exc()}", flush=True)
+        error_frame(ws, "An unexpected error occurred while processing your message.", str(e), turn_id=turn_id, source="partner")
+    else:
+        ai_response = "".join(parts)
+        print(f"\n=== LLM PARTNER RESPONSE (socket) ===\n{ai_response}\n===================\n", flush=True)
+        response_data = parse_partner_response(ai_response)
+        try:
+            context.add_message('assistant', response_data['message'])
+        except Exception as e:
+            print(f"Error saving socket message: {str(e)}", flush=True)
+            error_frame(ws, "Could not save the partner's reply.", str(e), turn_id=turn_id, source="store")
+        send_frame(ws, "partner_done", turn_id=turn_id, **response_data)
+
+    if not tutor_sent:
+        send_tutor()
+    send_frame(ws, "turn_done", turn_id=turn_id)
+
+
+@sock.route('/conversation/ws', bp=bp)
+def conversation_socket(ws):
+    """
+    Persistent conversation channel for one session.
+
+    Connect with ?session_id=...&scene_id=...[&first_language=zh], authenticated by the
+    Authorization header or a first {"type": "auth", "token": ...} frame. Then send
+    {"type": "turn", "user_input": ..., "turn_id": optional} frames; each turn is answered
+    with partner_token, partner_done, tutor_feedback and turn_done frames (or error frames),
+    all carrying the turn_id.
+    """
+    print("\n=== CONVERSATION SOCKET OPENED ===", flush=True)
+    try:
+        user = authenticate(ws)
+    except PermissionError as e:
+        error_frame(ws, str(e))
+        ws.close(reason=1008, message=str(e))
+        return
+
+    session_id = request.args.get('session_id')
+    scene_id = request.args.get('scene_id')
+    if not session_id or not scene_id:
+        error_frame(ws, "session_id and scene_id are required")
+        ws.close(reason=1008, message="session_id and scene_id are required")
+        return
+
+    try:
+        session = mongo.db.conversation_sessions.find_one({'_id': ObjectId(session_id)}, {'user_uid': 1})
+        if not session or session.get('user_uid') != user['uid']:
+            error_frame(ws, "Unauthorized access")
+            ws.close(reason=1008, message="Unauthorized access")
+            return
+        context = SessionContext(session_id, scene_id, user['uid'], "B1", request.args.get('first_language', 'zh'))
+    except Exception as e:
+        print(f"Error opening conversation socket: {str(e)}", flush=True)
+        error_frame(ws, "Could not load the conversation.", str(e))
+        ws.close(reason=1011, message="Could not load the conversation.")
+        return
+
+    send_frame(ws, "ready", session_id=session_id)
+    try:
+        while True:
+            frame = ws.receive()
+            try:
+                message = json.loads(frame)
+            except (TypeError, json.JSONDecodeError):
+                error_frame(ws, "Frames must be JSON objects")
+                continue
+
+            if message.get('type') == 'ping':
+                send_frame(ws, "pong")
+            elif message.get('type') == 'turn':
+                if not message.get('user_input'):
+                    error_frame(ws, "user_input is required", turn_id=message.get('turn_id'))
+                    continue
+                run_turn(ws, context, message['user_input'], message.get('turn_id'))
+            else:
+                error_frame(ws, f"Unknown frame type: {message.get('type')}")
+    except ConnectionClosed:
+        print(f"Conversation socket closed for session {session_id}", flush=True)
@@ -4,6 +4,8 @@ from app.models.mongo_models import UnfamiliarWord, WrongGrammar, BestFitWord, B
 from datetime import datetime
 from bson import ObjectId
 from app.auth import verify_token, verify_same_user
+from app.learning_store import insert_learning_items
+from config import Config
 
 bp = Blueprint('learning', __name__, url_prefix='/api')
 
@@ -109,6 +111,33 @@ def add_expression_improvement():
         "timestamp": new_improvement.timestamp.isoformat()
     }), 201
 
+@bp.route('/learning/batch', methods=['POST'])
+@verify_token
+@verify_same_user
+def add_learning_batch():
+    """
+    Store a mixed batch of learning items in one request.
+
+    Body: {"uid": ..., "items": [{"type": "unfamiliar_word" | "grammar_mistake" |
+    "word_improvement" | "expression_improvement", "session_id": ..., <type fields>}]}.
+    Every item gets a result with either its id or an error; valid items are
+    stored even if others fail.
+    """
+    data = request.get_json()
+    if not data or not isinstance(data.get('items'), list):
+        return jsonify({"error": "items array is required"}), 400
+    if len(data['items']) > Config.LEARNING_BATCH_MAX_ITEMS:
+        return jsonify({"error": f"at most {Config.LEARNING_BATCH_MAX_ITEMS} items per batch"}), 413
+
+    results = insert_learning_items(data['items'], data['uid'])
+    inserted = sum(1 for result in results if 'id' in result)
+
+    return jsonify({
+        "inserted": inserted,
+        "failed": len(results) - inserted,
+        "results": results
+    }), 200
+
 @bp.route('/learning/user/<user_uid>/progress', methods=['GET'])
 @verify_token
 @verify_same_user
@@ -0,0 +1,20 @@
+from flask import Blueprint, jsonify
+from app.auth import verify_token
+from app.catalog import scene_cache, catalog_snapshots
+from app.routes.conversation import llm_client, tutor_cache
+from app.routes.tts import tts_cache
+from app.tutor_jobs import tutor_jobs
+
+bp = Blueprint('metrics', __name__, url_prefix='/api')
+
+@bp.route('/metrics', methods=['GET'])
+@verify_token
+def get_metrics():
+    return jsonify({
+        'llm_client': llm_client.stats(),
+        'tutor_cache': tutor_cache.stats(),
+        'scene_cache': scene_cache.stats(),
+        'tutor_jobs': tutor_jobs.stats(),
+        'tts_cache': tts_cache.stats(),
+        'catalog_snapshots': {'builds': catalog_snapshots.builds}
+    })
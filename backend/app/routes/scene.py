@@ -1,45 +1,104 @@
-from flask import Blueprint, jsonify, request, send_file
+from flask import Blueprint, jsonify, request, send_file, current_app
 from app.extensions import mongo
 from app.models.mongo_models import Topic, Scene, SceneLevel
 from datetime import datetime
 from bson import ObjectId
+from bson.errors import InvalidId
 from app.auth import verify_token
+from app.catalog import catalog_version, catalog_etag, scene_cache, catalog_snapshots
+from app.audio import AUDIO_DIR, audio_index
+from app.pagination import page_args, find_page, PageArgsError, NEXT_CURSOR_HEADER
+from app.scene_tree import scene_hierarchy, build_subtree, InvalidParent
+from config import Config
 import os
 
 bp = Blueprint('scene', __name__, url_prefix='/api')
 
-
-# Configure audio storage directory
-AUDIO_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'static', 'audio')
+# Make sure the audio storage directory exists
 os.makedirs(AUDIO_DIR, exist_ok=True)
 
+# Response field -> document field for topic and scene listings
+CATALOG_FIELDS = {
+    'id': '_id',
+    'name': 'name',
+    'description': 'description'
+}
+
+def parse_object_id(value):
+    """value as an ObjectId, or None if it isn't a valid id"""
+    try:
+        return ObjectId(value)
+    except (InvalidId, TypeError):
+        return None
+
+def catalog_page(collection, query):
+    """
+    A page of topics or scenes as a JSON array. Supports ?limit=, ?after= and ?fields=;
+    when there are more, the cursor for the next page is in the X-Next-Cursor header.
+    """
+    try:
+        limit, after, selected = page_args(CATALOG_FIELDS)
+    except PageArgsError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    items, next_cursor = find_page(collection, query, limit, after, CATALOG_FIELDS, selected)
+    response = jsonify(items)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return response
+
 @bp.route('/topics', methods=['GET'])
 @verify_token
+@catalog_etag
 def get_topics():
-    topics = list(mongo.db.topics.find())
-    return jsonify([{
-        'id': str(topic['_id']),
-        'name': topic['name'],
-        'description': topic.get('description')
-    } for topic in topics])
+    return catalog_page(mongo.db.topics, {})
 
 @bp.route('/topics/<topic_id>/scenes', methods=['GET'])
 @verify_token
+@catalog_etag
 def get_scenes(topic_id):
-    scenes = list(mongo.db.scenes.find({'topic_id': ObjectId(topic_id)}))
-    return jsonify([{
-        'id': str(scene['_id']),
-        'name': scene['name'],
-        'description': scene.get('description')
-    } for scene in scenes])
+    return catalog_page(mongo.db.scenes, {'topic_id': ObjectId(topic_id)})
+
+@bp.route('/scenes/<scene_id>/subtree', methods=['GET'])
+@verify_token
+@catalog_etag
+def get_scene_subtree(scene_id):
+    """
+    The scene with all of its sub-scenes nested under "children", read in one query
+    on the materialized ancestors whatever the depth.
+    """
+    root_id = parse_object_id(scene_id)
+    if root_id is None:
+        return jsonify({'error': 'Invalid scene id'}), 400
+    scenes = mongo.db.scenes.find(
+        {'$or': [{'_id': root_id}, {'ancestors._id': root_id}]},
+        {'name': 1, 'description': 1, 'parent_id': 1, 'depth': 1},
+        sort=[('path', 1)]
+    )
+    tree = build_subtree(scenes, root_id)
+    if tree is None:
+        return jsonify({'error': 'Scene not found'}), 404
+    return jsonify(tree)
+
+@bp.route('/scenes/<scene_id>/breadcrumb', methods=['GET'])
+@verify_token
+@catalog_etag
+def get_scene_breadcrumb(scene_id):
+    """The scenes from the top-level scene down to this one, as [{id, name}]"""
+    scene_oid = parse_object_id(scene_id)
+    if scene_oid is None:
+        return jsonify({'error': 'Invalid scene id'}), 400
+    scene = mongo.db.scenes.find_one({'_id': scene_oid}, {'name': 1, 'ancestors': 1})
+    if not scene:
+        return jsonify({'error': 'Scene not found'}), 404
+    crumbs = scene.get('ancestors', []) + [scene]
+    return jsonify([{'id': str(crumb['_id']), 'name': crumb['name']} for crumb in crumbs])
 
 @bp.route('/scenes/<scene_id>/levels/<level>', methods=['GET'])
 @verify_token
+@catalog_etag
 def get_scene_level(scene_id, level):
-    scene_level = mongo.db.scene_levels.find_one({
-        'scene_id': ObjectId(scene_id),
-        'english_level': level.upper()
-    })
+    scene_level = scene_cache.get_scene_level(scene_id, level)
     
     if not scene_level:
         return jsonify({
@@ -57,6 +116,35 @@ def get_scene_level(scene_id, level):
         'createdAt': scene_level.get('created_at')
     })
 
+@bp.route('/catalog/snapshot', methods=['GET'])
+@verify_token
+def get_catalog_snapshot():
+    """
+    Every topic with its scenes and their summaries for ?level= (default B1), in one
+    response. The payload is prebuilt per catalog version and sent gzip-compressed to
+    clients that accept it; the ETag changes with the catalog version.
+    """
+    level = request.args.get('level', 'B1').upper()
+    snapshot = catalog_snapshots.get(level)
+    use_gzip = 'gzip' in request.accept_encodings
+    
+    # Each encoding is its own representation, so it gets its own strong ETag
+    etag = f"catalog-{snapshot.version}-{level}" + ("-gzip" if use_gzip else "")
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = current_app.response_class(
+            snapshot.gzipped if use_gzip else snapshot.body,
+            mimetype='application/json'
+        )
+        if use_gzip:
+            response.headers['Content-Encoding'] = 'gzip'
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['X-Catalog-Version'] = str(snapshot.version)
+    return response
+
 @bp.route('/topics', methods=['POST'])
 def create_topic():
     data = request.get_json()
@@ -70,6 +158,7 @@ def create_topic():
     )
     
     result = mongo.db.topics.insert_one(new_topic.to_dict())
+    catalog_version.bump()
     new_topic_id = result.inserted_id
     
     return jsonify({
@@ -83,16 +172,27 @@ def create_scene(topic_id):
     data = request.get_json()
     if not data or 'name' not in data:
         return jsonify({'error': 'Name is required'}), 400
+    parent_id = parse_object_id(data['parent_id']) if data.get('parent_id') else None
+    if data.get('parent_id') and parent_id is None:
+        return jsonify({'error': 'Invalid parent_id'}), 400
     
     new_scene = Scene(
         name=data['name'],
         topic_id=ObjectId(topic_id),
         description=data.get('description'),
         icon_path=data.get('icon_path'),
-        parent_id=ObjectId(data['parent_id']) if data.get('parent_id') else None
+        parent_id=parent_id
     )
+    try:
+        hierarchy = scene_hierarchy(mongo.db, new_scene._id, new_scene.parent_id, new_scene.topic_id)
+    except InvalidParent as e:
+        return jsonify({'error': str(e)}), 400
+    new_scene.ancestors = hierarchy['ancestors']
+    new_scene.path = hierarchy['path']
+    new_scene.depth = hierarchy['depth']
     
     result = mongo.db.scenes.insert_one(new_scene.to_dict())
+    catalog_version.bump()
     new_scene_id = result.inserted_id
     
     return jsonify({
@@ -113,10 +213,12 @@ def create_scene_level(scene_id):
         example_dialogs=data.get('example_dialogs'),
         key_phrases=data.get('key_phrases'),
         vocabulary=data.get('vocabulary'),
-        grammar_points=data.get('grammar_points')
+        grammar_points=data.get('grammar_points'),
+        opening_remarks_text=data.get('opening_remarks_text')
     )
     
     result = mongo.db.scene_levels.insert_one(new_scene_level.to_dict())
+    catalog_version.bump()
     new_level_id = result.inserted_id
     
     return jsonify({
@@ -128,51 +230,40 @@ def create_scene_level(scene_id):
 @bp.route('/scenes/<scene_id>/opening-remarks', methods=['GET'])
 @verify_token
 def get_opening_remarks_audio(scene_id):
+    """
+    Opening remarks audio for ?level= (default B1), served inline with Range support,
+    a content-hash ETag, Last-Modified and a long-lived Cache-Control, so clients can
+    start playback and seek without a full download and replay from cache.
+    """
     try:
         # Get the English level from query parameters
         english_level = request.args.get('level', 'B1').upper()
         
-        # Convert scene_id to ObjectId
-        scene_id_obj = ObjectId(scene_id)
-        
-        # Get the scene level
-        scene_level = mongo.db.scene_levels.find_one({
-            'scene_id': scene_id_obj,
-            'english_level': english_level
-        })
-        
-        if not scene_level:
-            print(f"Scene level not found for scene_id: {scene_id}, level: {english_level}", flush=True)
+        audio = audio_index.resolve(scene_id, english_level)
+        if audio is None:
+            # If no audio found, return empty response with 200
+            print(f"No audio found for scene_id: {scene_id}, level {english_level}", flush=True)
             return jsonify({'message': 'No audio available'}), 200
-            
-        # Try to get scene-specific audio file
-        audio_path = None
-        if scene_level.get('opening_remarks_audio_path'):
-            audio_path = scene_level['opening_remarks_audio_path']
-            if os.path.exists(audio_path):
-                print(f"Found scene-specific audio at: {audio_path}", flush=True)
-                return send_file(
-                    audio_path,
-                    mimetype='audio/mpeg',
-                    as_attachment=True,
-                    download_name=f'opening_remarks_{scene_id}_{english_level}.mp3'
-                )
         
-        # If no scene-specific audio found, use default audio for the level
-        default_audio_path = os.path.join(AUDIO_DIR, f'default_{english_level}.mp3')
-        if os.path.exists(default_audio_path):
-            print(f"Using default audio for level {english_level}", flush=True)
-            return send_file(
-                default_audio_path,
+        try:
+            response = send_file(
+                audio.path,
                 mimetype='audio/mpeg',
-                as_attachment=True,
-                download_name=f'opening_remarks_{scene_id}_{english_level}.mp3'
+                download_name=f'opening_remarks_{scene_id}_{english_level}.mp3',
+                conditional=True,
+                etag=audio.etag,
+                max_age=Config.AUDIO_MAX_AGE
             )
-            
-        # If no audio found, return empty response with 200
-        print(f"No audio found for level {english_level}", flush=True)
-        return jsonify({'message': 'No audio available'}), 200
+        except FileNotFoundError:
+            # The file went away since it was indexed; look it up again next time
+            audio_index.forget(scene_id, english_level)
+            return jsonify({'message': 'No audio available'}), 200
+        
+        # Served to signed-in users only, so keep it out of shared caches
+        response.cache_control.public = False
+        response.cache_control.private = True
+        return response
         
     except Exception as e:
         print(f"Error serving audio file: {str(e)}", flush=True)
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
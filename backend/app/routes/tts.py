@@ -0,0 +1,67 @@
+import io
+import logging
+from flask import Blueprint, jsonify, request, send_file
+from app.auth import verify_token
+from app.tts import AUDIO_MIMETYPES, VOICES, AudioCache, create_tts_backend, normalize_speech_text
+from config import Config
+
+bp = Blueprint('tts', __name__, url_prefix='/api')
+logger = logging.getLogger(__name__)
+
+tts_backend = create_tts_backend()
+tts_cache = AudioCache()
+
+@bp.route('/tts', methods=['POST'])
+@verify_token
+def synthesize_speech():
+    """
+    Speech audio for {"text", "voice", "format"}, so devices don't need the API key.
+    Served from the on-disk audio cache when the same normalized text was rendered
+    before with the same voice and format; X-Cache says which.
+    """
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data.get('text'), str):
+        return jsonify({'error': 'text is required'}), 400
+
+    text = normalize_speech_text(data['text'])
+    voice = (data.get('voice') or Config.TTS_VOICE).lower()
+    audio_format = (data.get('format') or 'mp3').lower()
+    if not text:
+        return jsonify({'error': 'text is required'}), 400
+    if len(text) > Config.TTS_MAX_TEXT_LENGTH:
+        return jsonify({'error': f'text must be at most {Config.TTS_MAX_TEXT_LENGTH} characters'}), 400
+    if voice not in VOICES:
+        return jsonify({'error': f"voice must be one of: {', '.join(VOICES)}"}), 400
+    if audio_format not in AUDIO_MIMETYPES:
+        return jsonify({'error': f"format must be one of: {', '.join(AUDIO_MIMETYPES)}"}), 400
+
+    key = tts_backend.audio_key(text, voice, audio_format)
+    try:
+        path, rendered = tts_cache.get_or_render(
+            key, audio_format, lambda: tts_backend.synthesize(text, voice, audio_format)
+        )
+    except Exception as e:
+        print(f"Error generating speech: {str(e)}", flush=True)
+        logger.error(f"TTS request failed: {str(e)}")
+        return jsonify({'error': 'Failed to generate speech'}), 502
+
+    try:
+        # A fresh render is served from memory, in case the file was already evicted again
+        source = io.BytesIO(rendered) if rendered is not None else path
+        response = send_file(
+            source,
+            mimetype=AUDIO_MIMETYPES[audio_format],
+            download_name=f'speech.{audio_format}',
+            etag=key,
+            max_age=Config.AUDIO_MAX_AGE
+        )
+    except FileNotFoundError:
+        # Evicted between the lookup and sending it; the next request renders it again
+        tts_cache.delete(key, audio_format)
+        return jsonify({'error': 'Audio no longer available, please retry'}), 503
+
+    # Identical requests always get identical audio, but only signed-in users may fetch it
+    response.cache_control.public = False
+    response.cache_control.private = True
+    response.headers['X-Cache'] = 'MISS' if rendered is not None else 'HIT'
+    return response
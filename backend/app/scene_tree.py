@@ -0,0 +1,99 @@
+import logging
+from typing import Dict, List, Optional
+from bson import ObjectId
+
+logger = logging.getLogger(__name__)
+
+# Separator between scene ids in Scene.path
+PATH_SEPARATOR = '/'
+
+
+class InvalidParent(ValueError):
+    """Raised when a scene's parent_id doesn't name an existing scene of the same topic"""
+
+
+def hierarchy_fields(scene_id: ObjectId, parent: Optional[dict]) -> dict:
+    """
+    Materialized hierarchy of a scene under parent (None for a top-level scene):
+    ancestors as [{_id, name}] from the root down, path as the ids from the root down
+    to the scene itself, and depth (0 at the root).
+    """
+    if parent is None:
+        return {'ancestors': [], 'path': str(scene_id), 'depth': 0}
+    return {
+        'ancestors': parent['ancestors'] + [{'_id': parent['_id'], 'name': parent['name']}],
+        'path': f"{parent['path']}{PATH_SEPARATOR}{scene_id}",
+        'depth': parent['depth'] + 1
+    }
+
+
+def scene_hierarchy(db, scene_id: ObjectId, parent_id: Optional[ObjectId], topic_id: ObjectId) -> dict:
+    """
+    Hierarchy fields for a new scene of topic_id, read from its parent's materialized
+    fields. Sub-scenes must belong to their parent's topic.
+    """
+    if parent_id is None:
+        return hierarchy_fields(scene_id, None)
+    parent = db.scenes.find_one({'_id': parent_id}, {'name': 1, 'topic_id': 1, 'ancestors': 1, 'path': 1, 'depth': 1})
+    if parent is None:
+        raise InvalidParent(f"Parent scene {parent_id} not found")
+    if parent.get('topic_id') != topic_id:
+        raise InvalidParent(f"Parent scene {parent_id} belongs to a different topic")
+    if 'path' not in parent:
+        # Parent predates the materialized hierarchy (see scripts/backfill_scene_hierarchy.py)
+        raise InvalidParent(f"Parent scene {parent_id} has no hierarchy yet; run the backfill first")
+    return hierarchy_fields(scene_id, parent)
+
+
+def materialize_hierarchy(scenes: List[dict]) -> Dict[ObjectId, dict]:
+    """
+    Hierarchy fields for every scene in scenes (each with _id, name and parent_id),
+    keyed by scene id. Scenes whose parent is missing, or that are part of a cycle,
+    are treated as top-level scenes.
+    """
+    by_id = {scene['_id']: scene for scene in scenes}
+    fields = {}
+
+    def resolve(scene_id, visiting):
+        if scene_id in fields:
+            return fields[scene_id]
+        parent_id = by_id[scene_id].get('parent_id')
+        parent = None
+        if parent_id is not None:
+            if parent_id not in by_id or parent_id in visiting:
+                logger.warning(f"Scene {scene_id} has a missing or cyclic parent {parent_id}; treating it as top-level")
+            else:
+                visiting.add(scene_id)
+                parent = dict(resolve(parent_id, visiting), _id=parent_id, name=by_id[parent_id]['name'])
+        fields[scene_id] = hierarchy_fields(scene_id, parent)
+        return fields[scene_id]
+
+    for scene_id in by_id:
+        resolve(scene_id, set())
+    return fields
+
+
+def scene_node(scene: dict) -> dict:
+    return {
+        'id': str(scene['_id']),
+        'name': scene['name'],
+        'description': scene.get('description'),
+        'depth': scene.get('depth', 0),
+        'children': []
+    }
+
+
+def build_subtree(scenes: List[dict], root_id: ObjectId) -> Optional[dict]:
+    """
+    Nest scenes (the root and its descendants, sorted by path so parents come before
+    their children) into a tree of scene_node dicts. None if the root isn't among them.
+    """
+    nodes = {}
+    root = None
+    for scene in scenes:
+        node = nodes[scene['_id']] = scene_node(scene)
+        if scene['_id'] == root_id:
+            root = node
+        elif scene.get('parent_id') in nodes:
+            nodes[scene['parent_id']]['children'].append(node)
+    return root
@@ -0,0 +1,66 @@
+import threading
+import logging
+from app import background
+from app.conversation_store import load_summary, read_messages, save_summary
+from app.llm.prompts import Prompts, count_oldest_turns
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Sessions with a summarization queued or running in this process
+_in_progress = set()
+_in_progress_lock = threading.Lock()
+
+
+def maybe_schedule_summary(llm_client, session_id, message_count: int, summarized_count: int):
+    """
+    Fold older turns into the session's rolling summary in the background once enough
+    of them have built up outside the most recent SUMMARY_KEEP_RECENT_MESSAGES.
+    """
+    summarized_count = summarized_count or 0
+    stop = message_count - Config.SUMMARY_KEEP_RECENT_MESSAGES
+    if stop - summarized_count < Config.SUMMARY_BATCH_MESSAGES:
+        return
+
+    session_key = str(session_id)
+    with _in_progress_lock:
+        if session_key in _in_progress:
+            return
+        _in_progress.add(session_key)
+
+    future = background.submit(update_summary, llm_client, session_key, stop)
+    future.add_done_callback(lambda _: _release(session_key))
+
+
+def _release(session_key: str):
+    with _in_progress_lock:
+        _in_progress.discard(session_key)
+
+
+def update_summary(llm_client, session_id, stop: int):
+    """
+    Fold every message before index `stop` into the session's rolling summary, in
+    batches of the oldest turns that fit SUMMARY_INPUT_TOKEN_BUDGET, so a backlog is
+    worked through without any turn being skipped.
+    """
+    previous_summary, summarized_count = load_summary(session_id)
+    while summarized_count < stop:
+        messages = read_messages(session_id, summarized_count, stop)
+        if not messages:
+            return
+        messages = messages[:count_oldest_turns(messages, Config.SUMMARY_INPUT_TOKEN_BUDGET)]
+
+        prompt = Prompts.generate_summary_prompt(previous_summary, messages)
+        summary = llm_client.get_completion(
+            prompt,
+            "Write the updated summary.",
+            temperature=0.3,
+            role="summary"
+        ).strip()
+
+        new_count = summarized_count + len(messages)
+        if not save_summary(session_id, summary, summarized_count, new_count):
+            logger.info(f"Discarded stale summary for session {session_id}")
+            return
+        print(f"Session {session_id} summary now covers {new_count} messages", flush=True)
+        previous_summary, summarized_count = summary, new_count
@@ -0,0 +1,255 @@
+import os
+import hashlib
+import threading
+import time
+import logging
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+from openai import OpenAI
+from app.cache import fingerprint, CacheStats
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Content types of the audio formats the backends can produce
+AUDIO_MIMETYPES = {
+    'mp3': 'audio/mpeg',
+    'opus': 'audio/ogg',
+    'aac': 'audio/aac',
+    'flac': 'audio/flac',
+    'wav': 'audio/wav'
+}
+
+# Voices offered by the speech API
+VOICES = ('alloy', 'echo', 'fable', 'onyx', 'nova', 'shimmer')
+
+
+def normalize_speech_text(text: str) -> str:
+    """Trim and collapse whitespace, which doesn't change how the text is spoken"""
+    return ' '.join((text or '').split())
+
+
+class TTSBackend(ABC):
+    """Text-to-speech backend: turns text into audio bytes in one of AUDIO_MIMETYPES' formats"""
+    name = None
+
+    @abstractmethod
+    def synthesize(self, text: str, voice: str, audio_format: str = 'mp3') -> bytes:
+        """Audio bytes for text spoken in voice, encoded as audio_format"""
+
+    def audio_key(self, text: str, voice: str, audio_format: str = 'mp3') -> str:
+        """
+        Content address for the audio this backend renders for text: identical inputs map
+        to the same key (and file), so audio is only ever rendered once.
+        """
+        return fingerprint(self.name, getattr(self, 'model', None), voice, audio_format, normalize_speech_text(text))
+
+
+class OpenAITTSBackend(TTSBackend):
+    """OpenAI speech API (the same model the Android app calls directly)"""
+    name = 'openai'
+
+    def __init__(self, model: str = None, timeout: float = None):
+        self.model = model or Config.TTS_MODEL
+        self.timeout = timeout or Config.LLM_TIMEOUT
+        self._client = None
+
+    def synthesize(self, text: str, voice: str, audio_format: str = 'mp3') -> bytes:
+        if self._client is None:
+            self._client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'), timeout=self.timeout)
+        response = self._client.audio.speech.create(
+            model=self.model,
+            voice=voice,
+            input=text,
+            response_format=audio_format
+        )
+        return response.content
+
+
+class StubTTSBackend(TTSBackend):
+    """
+    Offline backend for tests and local runs: returns small deterministic bytes derived
+    from the input instead of real speech.
+    """
+    name = 'stub'
+
+    def synthesize(self, text: str, voice: str, audio_format: str = 'mp3') -> bytes:
+        digest = hashlib.sha256(f"{voice}:{audio_format}:{text}".encode('utf-8')).digest()
+        return b'ID3\x04\x00\x00\x00\x00\x00\x00' + digest * 8
+
+
+def create_tts_backend(backend: str = None) -> TTSBackend:
+    """Build the TTS backend named by `backend` (default TTS_BACKEND)"""
+    backend = (backend or Config.TTS_BACKEND).lower()
+    if backend == 'openai':
+        return OpenAITTSBackend()
+    if backend == 'stub':
+        return StubTTSBackend()
+    raise ValueError(f"Unknown TTS backend: {backend}")
+
+
+def write_atomic(path: str, data: bytes):
+    """Write a file so readers never see it half-written"""
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class AudioCache(CacheStats):
+    """
+    On-disk content-addressed audio cache bounded by total size.
+
+    Files are named <audio_key>.<format>, so a file's name says exactly what it holds
+    and nothing is ever overwritten with different audio. The directory may be shared
+    by several worker processes: a file another worker rendered is picked up from disk.
+    Each process keeps an index of the directory, updated as it reads and writes, and
+    rescans the directory when its index says the cache is over max_bytes or the last
+    scan is older than RESCAN_INTERVAL, then deletes the least recently used files (by
+    mtime, which hits refresh). So the bound applies to the shared directory, give or
+    take what other workers wrote since the last scan. Concurrent misses for the same
+    key in one process render once.
+    """
+    backend = 'disk'
+
+    # Rescan the directory at least this often (seconds), to see other workers' writes
+    RESCAN_INTERVAL = 300
+
+    def __init__(self, directory: str = None, max_bytes: int = None):
+        super().__init__()
+        self.directory = directory or Config.TTS_CACHE_DIR
+        self.max_bytes = max_bytes or Config.TTS_CACHE_MAX_BYTES
+        self._entries = OrderedDict()  # filename -> size, least recently used first
+        self._bytes = 0
+        self._scanned_at = None
+        self._lock = threading.Lock()
+        self._scan_lock = threading.Lock()
+        self._render_locks = {}
+
+    def _scan(self) -> OrderedDict:
+        """The files on disk as filename -> size, least recently used first"""
+        os.makedirs(self.directory, exist_ok=True)
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and not entry.name.endswith('.tmp'):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, entry.name, stat.st_size))
+        return OrderedDict((name, size) for _, name, size in sorted(files))
+
+    def _rescan(self, keep: str = None):
+        """
+        Re-index the directory and delete the least recently used files beyond
+        max_bytes, never `keep`. The scan runs outside _lock, so lookups aren't held
+        up; only one thread rescans at a time and others skip it.
+        """
+        if not self._scan_lock.acquire(blocking=False):
+            return
+        try:
+            entries = self._scan()
+            evicted = []
+            with self._lock:
+                # Recency comes from mtimes, which hits refresh, so the scan's order stands;
+                # files written during the scan are adopted by the next lookup
+                if keep in entries:
+                    entries.move_to_end(keep)
+                self._entries = entries
+                self._bytes = sum(entries.values())
+                self._scanned_at = time.monotonic()
+                while self._bytes > self.max_bytes and len(self._entries) > 1:
+                    old_name, size = self._entries.popitem(last=False)
+                    self._bytes -= size
+                    evicted.append(old_name)
+        finally:
+            self._scan_lock.release()
+
+        for old_name in evicted:
+            try:
+                os.remove(os.path.join(self.directory, old_name))
+            except FileNotFoundError:
+                pass
+        if evicted:
+            self._record_evictions(len(evicted))
+
+    def _scan_due(self) -> bool:
+        return self._scanned_at is None or time.monotonic() - self._scanned_at >= self.RESCAN_INTERVAL
+
+    def path_for(self, key: str, audio_format: str) -> str:
+        return os.path.join(self.directory, f"{key}.{audio_format}")
+
+    def _lookup(self, key: str, audio_format: str) -> bool:
+        """
+        Whether the audio for key is on disk, marking it as recently used. Files not in
+        this process's index (rendered by another worker) are adopted.
+        """
+        name = f"{key}.{audio_format}"
+        path = self.path_for(key, audio_format)
+        if self._scanned_at is None:
+            self._rescan()
+        try:
+            os.utime(path)
+            size = os.stat(path).st_size
+        except FileNotFoundError:
+            # Never rendered, or evicted by another worker sharing the directory
+            self.delete(key, audio_format)
+            return False
+        with self._lock:
+            self._bytes += size - self._entries.pop(name, 0)
+            self._entries[name] = size
+        return True
+
+    def get(self, key: str, audio_format: str) -> Optional[str]:
+        """Path of the cached audio for key, or None"""
+        hit = self._lookup(key, audio_format)
+        self._record(hit)
+        return self.path_for(key, audio_format) if hit else None
+
+    def set(self, key: str, audio_format: str, data: bytes) -> str:
+        path = self.path_for(key, audio_format)
+        name = os.path.basename(path)
+        write_atomic(path, data)
+
+        with self._lock:
+            self._bytes += len(data) - self._entries.pop(name, 0)
+            self._entries[name] = len(data)
+            rescan = self._bytes > self.max_bytes or self._scan_due()
+        if rescan:
+            self._rescan(keep=name)
+        return path
+
+    def delete(self, key: str, audio_format: str):
+        with self._lock:
+            self._bytes -= self._entries.pop(f"{key}.{audio_format}", 0)
+
+    def get_or_render(self, key: str, audio_format: str, render: Callable[[], bytes]) -> Tuple[str, Optional[bytes]]:
+        """
+        (path, None) on a hit; on a miss render() is called and its bytes cached and
+        returned as (path, data), so the caller can serve them even if the file has
+        already been evicted again.
+        """
+        path = self.get(key, audio_format)
+        if path:
+            return path, None
+        with self._lock:
+            render_lock = self._render_locks.setdefault(key, threading.Lock())
+        try:
+            with render_lock:
+                # Someone else may have rendered it while we waited
+                if self._lookup(key, audio_format):
+                    return self.path_for(key, audio_format), None
+                data = render()
+                return self.set(key, audio_format, data), data
+        finally:
+            with self._lock:
+                self._render_locks.pop(key, None)
+
+    def size(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        stats.update(bytes=self._bytes, max_bytes=self.max_bytes)
+        return stats
@@ -0,0 +1,125 @@
+import threading
+import time
+import logging
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, List
+from bson import ObjectId
+from bson.errors import InvalidId
+from app.extensions import mongo
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    """Raised when the job queue already holds max_pending jobs"""
+
+
+class TutorJobQueue:
+    """
+    In-process worker pool for tutor feedback jobs, with results stored in tutor_jobs.
+
+    Jobs are recorded in Mongo so any worker can serve their results; a waiter in the
+    process that ran the job is woken as soon as it finishes, others re-check Mongo
+    every poll_interval seconds. Finished jobs expire via the TTL index on expires_at.
+    """
+
+    def __init__(self, workers: int = None, max_pending: int = None, poll_interval: float = None):
+        self.workers = workers or Config.TUTOR_JOB_WORKERS
+        self.max_pending = max_pending or Config.TUTOR_JOB_MAX_PENDING
+        self.poll_interval = poll_interval or Config.TUTOR_JOB_POLL_INTERVAL
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='tutor-job')
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._completed = threading.Condition()
+        self._completions = 0
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def submit(self, user_uid, session_id, work: Callable[[], dict]) -> str:
+        """Record a pending job and run work() in the pool; returns the job id"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise QueueFull("Too many tutor feedback jobs in progress")
+
+        now = datetime.utcnow()
+        job_id = ObjectId()
+        try:
+            mongo.db.tutor_jobs.insert_one({
+                '_id': job_id,
+                'user_uid': user_uid,
+                'session_id': session_id,
+                'status': 'pending',
+                'created_at': now,
+                'expires_at': now + timedelta(seconds=Config.TUTOR_JOB_TTL)
+            })
+            with self._lock:
+                self.pending += 1
+            self._executor.submit(self._run, job_id, work)
+        except Exception:
+            self._slots.release()
+            raise
+        return str(job_id)
+
+    def _run(self, job_id: ObjectId, work: Callable[[], dict]):
+        update = {}
+        try:
+            update.update(status='done', result=work())
+        except Exception as e:
+            logger.error(f"Tutor job {job_id} failed: {str(e)}\n{traceback.format_exc()}")
+            update.update(status='failed', error=str(e))
+        update['completed_at'] = datetime.utcnow()
+
+        try:
+            mongo.db.tutor_jobs.update_one({'_id': job_id}, {'$set': update})
+        finally:
+            with self._lock:
+                self.pending -= 1
+                if update['status'] == 'done':
+                    self.succeeded += 1
+                else:
+                    self.failed += 1
+            self._slots.release()
+            with self._completed:
+                self._completions += 1
+                self._completed.notify_all()
+
+    def wait(self, job_ids: List[str], user_uid, timeout: float) -> List[dict]:
+        """
+        Get the user's jobs among job_ids, waiting up to timeout seconds for at least
+        one of them to finish if none has yet. Unknown ids are left out.
+        """
+        try:
+            ids = [ObjectId(job_id) for job_id in job_ids]
+        except (InvalidId, TypeError):
+            raise ValueError("Invalid job id")
+
+        deadline = time.monotonic() + timeout
+        while True:
+            # Note the completion count before reading, so a job finishing in between still wakes us
+            seen = self._completions
+            jobs = list(mongo.db.tutor_jobs.find({'_id': {'$in': ids}, 'user_uid': user_uid}))
+            remaining = deadline - time.monotonic()
+            if not jobs or any(job['status'] != 'pending' for job in jobs) or remaining <= 0:
+                return jobs
+            with self._completed:
+                self._completed.wait_for(lambda: self._completions != seen, min(remaining, self.poll_interval))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'max_pending': self.max_pending,
+                'pending': self.pending,
+                'succeeded': self.succeeded,
+                'failed': self.failed,
+                'rejected': self.rejected
+            }
+
+
+tutor_jobs = TutorJobQueue()
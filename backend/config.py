@@ -13,6 +13,107 @@ class Config:
         'sqlite:///' + os.path.join(basedir, 'instance', 'app.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # LLM client configuration
+    LLM_MODEL = os.environ.get('LLM_MODEL') or 'gpt-4o-mini'
+    LLM_TIMEOUT = float(os.environ.get('LLM_TIMEOUT', 30.0))
+    LLM_MAX_CONNECTIONS = int(os.environ.get('LLM_MAX_CONNECTIONS', 20))
+    LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get('LLM_MAX_KEEPALIVE_CONNECTIONS', 10))
+    LLM_KEEPALIVE_EXPIRY = float(os.environ.get('LLM_KEEPALIVE_EXPIRY', 60.0))
+    LLM_MAX_IN_FLIGHT = int(os.environ.get('LLM_MAX_IN_FLIGHT', 16))
+
+    # Tutor structured output: ask for a JSON object and re-ask up to TUTOR_REPAIR_ATTEMPTS
+    # times when the reply doesn't match the feedback schema
+    TUTOR_JSON_MODE = os.environ.get('TUTOR_JSON_MODE', 'true').lower() in ('1', 'true', 'yes')
+    TUTOR_REPAIR_ATTEMPTS = int(os.environ.get('TUTOR_REPAIR_ATTEMPTS', 1))
+
+    # How many of the most recent session messages each role reads from Mongo
+    TUTOR_HISTORY_MESSAGES = int(os.environ.get('TUTOR_HISTORY_MESSAGES', 20))
+    PARTNER_HISTORY_MESSAGES = int(os.environ.get('PARTNER_HISTORY_MESSAGES', 40))
+
+    # Rolling conversation summary: once SUMMARY_BATCH_MESSAGES messages have built up beyond
+    # the most recent SUMMARY_KEEP_RECENT_MESSAGES, they are folded into the session summary
+    SUMMARY_KEEP_RECENT_MESSAGES = int(os.environ.get('SUMMARY_KEEP_RECENT_MESSAGES', 10))
+    SUMMARY_BATCH_MESSAGES = int(os.environ.get('SUMMARY_BATCH_MESSAGES', 20))
+    SUMMARY_INPUT_TOKEN_BUDGET = int(os.environ.get('SUMMARY_INPUT_TOKEN_BUDGET', 3000))
+    SUMMARY_MAX_WORDS = int(os.environ.get('SUMMARY_MAX_WORDS', 150))
+
+    # Worker threads for background work (summaries, bookkeeping writes)
+    BACKGROUND_WORKERS = int(os.environ.get('BACKGROUND_WORKERS', 4))
+
+    # Prompt token budgets: conversation history per role, and the user's own message.
+    # Tokens are counted with tiktoken, loaded at startup; set TIKTOKEN_CACHE_DIR to a
+    # directory holding the encoding file to avoid fetching it over the network
+    TUTOR_HISTORY_TOKEN_BUDGET = int(os.environ.get('TUTOR_HISTORY_TOKEN_BUDGET', 800))
+    PARTNER_HISTORY_TOKEN_BUDGET = int(os.environ.get('PARTNER_HISTORY_TOKEN_BUDGET', 1500))
+    USER_MESSAGE_TOKEN_LIMIT = int(os.environ.get('USER_MESSAGE_TOKEN_LIMIT', 300))
+
+    # Tutor response cache ("memory" for per-process, "mongo" to share across workers)
+    TUTOR_CACHE_BACKEND = os.environ.get('TUTOR_CACHE_BACKEND') or 'memory'
+    TUTOR_CACHE_MAX_SIZE = int(os.environ.get('TUTOR_CACHE_MAX_SIZE', 2048))
+    TUTOR_CACHE_TTL = float(os.environ.get('TUTOR_CACHE_TTL', 24 * 3600))
+    TUTOR_CACHE_HISTORY_MESSAGES = int(os.environ.get('TUTOR_CACHE_HISTORY_MESSAGES', 2))
+
+    # Catalog (topics/scenes/levels) caching
+    CATALOG_VERSION_CHECK_INTERVAL = float(os.environ.get('CATALOG_VERSION_CHECK_INTERVAL', 5.0))
+    SCENE_CACHE_MAX_SIZE = int(os.environ.get('SCENE_CACHE_MAX_SIZE', 1024))
+    # Topic/scene listing page sizes (?limit=); clients page on with ?after=<X-Next-Cursor>
+    CATALOG_PAGE_SIZE = int(os.environ.get('CATALOG_PAGE_SIZE', 100))
+    CATALOG_MAX_PAGE_SIZE = int(os.environ.get('CATALOG_MAX_PAGE_SIZE', 500))
+
+    # Idempotency-Key records: kept IDEMPOTENCY_TTL seconds; a retry waits up to
+    # IDEMPOTENCY_WAIT_TIMEOUT for the original request, which may hold the key for
+    # at most IDEMPOTENCY_LOCK_TIMEOUT before another request can take it over
+    IDEMPOTENCY_TTL = int(os.environ.get('IDEMPOTENCY_TTL', 24 * 3600))
+    IDEMPOTENCY_WAIT_TIMEOUT = float(os.environ.get('IDEMPOTENCY_WAIT_TIMEOUT', 60.0))
+    IDEMPOTENCY_LOCK_TIMEOUT = float(os.environ.get('IDEMPOTENCY_LOCK_TIMEOUT', 120.0))
+    IDEMPOTENCY_POLL_INTERVAL = float(os.environ.get('IDEMPOTENCY_POLL_INTERVAL', 0.2))
+
+    # Tutor feedback jobs: worker threads, how many may be queued or running, how long
+    # results are kept, and long-poll limits for fetching them
+    TUTOR_JOB_WORKERS = int(os.environ.get('TUTOR_JOB_WORKERS', 8))
+    TUTOR_JOB_MAX_PENDING = int(os.environ.get('TUTOR_JOB_MAX_PENDING', 200))
+    TUTOR_JOB_TTL = int(os.environ.get('TUTOR_JOB_TTL', 3600))
+    TUTOR_JOB_MAX_WAIT = float(os.environ.get('TUTOR_JOB_MAX_WAIT', 25.0))
+    TUTOR_JOB_POLL_INTERVAL = float(os.environ.get('TUTOR_JOB_POLL_INTERVAL', 1.0))
+
+    # Session archiving: sessions ended SESSION_ENDED_GRACE_SECONDS ago or idle for
+    # SESSION_IDLE_SECONDS move to conversation_archive, kept SESSION_ARCHIVE_RETENTION_DAYS.
+    # The background archiver is off by default: enable it in one process only, or run
+    # scripts/archive_sessions.py from cron. A pass claims each session for
+    # SESSION_ARCHIVE_CLAIM_SECONDS so overlapping passes skip it
+    SESSION_IDLE_SECONDS = int(os.environ.get('SESSION_IDLE_SECONDS', 7 * 24 * 3600))
+    SESSION_ENDED_GRACE_SECONDS = int(os.environ.get('SESSION_ENDED_GRACE_SECONDS', 3600))
+    SESSION_ARCHIVE_RETENTION_DAYS = int(os.environ.get('SESSION_ARCHIVE_RETENTION_DAYS', 365))
+    SESSION_ARCHIVER_ENABLED = os.environ.get('SESSION_ARCHIVER_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+    SESSION_ARCHIVE_INTERVAL = float(os.environ.get('SESSION_ARCHIVE_INTERVAL', 600))
+    SESSION_ARCHIVE_BATCH_SIZE = int(os.environ.get('SESSION_ARCHIVE_BATCH_SIZE', 500))
+    SESSION_ARCHIVE_CLAIM_SECONDS = int(os.environ.get('SESSION_ARCHIVE_CLAIM_SECONDS', 300))
+
+    # WebSocket conversation channel
+    SOCKET_AUTH_TIMEOUT = float(os.environ.get('SOCKET_AUTH_TIMEOUT', 10.0))
+    SOCKET_TUTOR_WORKERS = int(os.environ.get('SOCKET_TUTOR_WORKERS', 16))
+    SOCK_SERVER_OPTIONS = {'ping_interval': int(os.environ.get('SOCKET_PING_INTERVAL', 25))}
+
+    # Browser/app cache lifetime for opening remarks audio (revalidated by content-hash ETag after)
+    AUDIO_MAX_AGE = int(os.environ.get('AUDIO_MAX_AGE', 7 * 24 * 3600))
+    # How long the server remembers that a scene level has no audio file before looking again
+    AUDIO_MISS_TTL = float(os.environ.get('AUDIO_MISS_TTL', 60))
+
+    # Text-to-speech ("openai", or "stub" for offline tests) and audio pre-rendering
+    TTS_BACKEND = os.environ.get('TTS_BACKEND') or 'openai'
+    TTS_MODEL = os.environ.get('TTS_MODEL') or 'tts-1'
+    TTS_VOICE = os.environ.get('TTS_VOICE') or 'alloy'
+    TTS_RENDER_WORKERS = int(os.environ.get('TTS_RENDER_WORKERS', 4))
+
+    # /api/tts: content-addressed audio cache on disk, evicting least recently used files
+    # beyond TTS_CACHE_MAX_BYTES
+    TTS_CACHE_DIR = os.environ.get('TTS_CACHE_DIR') or os.path.join(basedir, 'instance', 'tts_cache')
+    TTS_CACHE_MAX_BYTES = int(os.environ.get('TTS_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+    TTS_MAX_TEXT_LENGTH = int(os.environ.get('TTS_MAX_TEXT_LENGTH', 4096))
+
+    # Learning item batch ingestion
+    LEARNING_BATCH_MAX_ITEMS = int(os.environ.get('LEARNING_BATCH_MAX_ITEMS', 1000))
+
     # Logging Configuration
     LOGGING_CONFIG = {
         'version': 1,
@@ -0,0 +1,47 @@
+"""
+Move ended and idle conversation sessions into conversation_archive.
+
+The app can do this in the background (SESSION_ARCHIVER_ENABLED, off by default);
+this script runs the same pass by hand or from cron. Sessions are claimed before
+they are archived, so overlapping runs don't archive the same session twice.
+Archived messages are stored zlib-compressed and expire after
+SESSION_ARCHIVE_RETENTION_DAYS.
+
+Usage: python scripts/archive_sessions.py [--idle-days N] [--limit N] [--dry-run]
+"""
+import sys
+import os
+import argparse
+from datetime import datetime
+
+# Add the backend directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import MongoClient
+from config import Config
+from app.archiver import archive_query, archive_inactive_sessions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--idle-days', type=float, help='override SESSION_IDLE_SECONDS')
+    parser.add_argument('--limit', type=int, help='archive at most this many sessions')
+    parser.add_argument('--dry-run', action='store_true', help='count sessions due for archiving without moving them')
+    args = parser.parse_args()
+
+    client = MongoClient(Config.MONGO_URI)
+    db = client.get_default_database(Config.MONGO_DBNAME)
+    idle_seconds = args.idle_days * 24 * 3600 if args.idle_days is not None else None
+
+    started = datetime.utcnow()
+    if args.dry_run:
+        due = db.conversation_sessions.count_documents(archive_query(started, idle_seconds))
+        print(f"Would archive {min(due, args.limit) if args.limit else due} sessions")
+        return
+
+    archived = archive_inactive_sessions(db, now=started, limit=args.limit, idle_seconds=idle_seconds)
+    print(f"Archived {archived} sessions in {(datetime.utcnow() - started).total_seconds():.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Fill in the materialized hierarchy (ancestors, path, depth) on every scene.
+
+create_scene maintains these fields for new scenes; run this once for scenes
+created before, and again after editing parent_id or scene names by hand. Safe to
+re-run: scenes whose fields are already correct are left alone. Bumps the catalog
+version if anything changed.
+
+Usage: python scripts/backfill_scene_hierarchy.py [--dry-run]
+"""
+import sys
+import os
+import argparse
+from datetime import datetime
+
+# Add the backend directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from pymongo import UpdateOne
+from config import Config
+from app.extensions import mongo
+from app.catalog import catalog_version
+from app.indexes import ensure_indexes
+from app.scene_tree import materialize_hierarchy
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dry-run', action='store_true', help='count scenes that would change without writing')
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.config['MONGO_URI'] = Config.MONGO_URI
+    mongo.init_app(app)
+
+    with app.app_context():
+        db = mongo.db
+        started = datetime.utcnow()
+        scenes = list(db.scenes.find({}, {'name': 1, 'parent_id': 1, 'ancestors': 1, 'path': 1, 'depth': 1}))
+        hierarchy = materialize_hierarchy(scenes)
+
+        updates = [
+            UpdateOne({'_id': scene['_id']}, {'$set': hierarchy[scene['_id']]})
+            for scene in scenes
+            if any(scene.get(field) != value for field, value in hierarchy[scene['_id']].items())
+        ]
+        if args.dry_run:
+            print(f"Would update {len(updates)} of {len(scenes)} scenes")
+            return
+
+        if updates:
+            db.scenes.bulk_write(updates, ordered=False)
+            catalog_version.bump()
+        ensure_indexes(db)
+        print(f"Updated {len(updates)} of {len(scenes)} scenes "
+              f"in {(datetime.utcnow() - started).total_seconds():.1f}s")
+
+
+if __name__ == '__main__':
+    main()
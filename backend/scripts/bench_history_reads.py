@@ -0,0 +1,108 @@
+"""
+Benchmark per-turn history reads as sessions grow.
+
+Compares reading a whole conversation_sessions document with every message
+embedded (the old behaviour) with the bucketed tail read used by the
+conversation routes. Runs against a scratch
+database, which is dropped afterwards.
+
+Usage: python scripts/bench_history_reads.py [--sizes 10,100,1000,5000] [--reads 200] [--mongo-uri URI]
+"""
+import sys
+import os
+import argparse
+import statistics
+import time
+from datetime import datetime
+
+# Add the backend directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from bson import ObjectId
+from pymongo.uri_parser import parse_uri
+from config import Config
+from app.extensions import mongo
+from app.conversation_store import load_history
+from app.models.mongo_models import MessageBucket
+
+BENCH_DB = 'lingomia_bench_history'
+# The database is dropped afterwards, so only scratch databases named like this are accepted
+BENCH_DB_PREFIX = 'lingomia_bench'
+
+
+def make_session(db, size: int) -> ObjectId:
+    session_id = ObjectId()
+    messages = [{
+        'role': 'user' if i % 2 == 0 else 'assistant',
+        'text': f"This is practice message number {i} in a long conversation about ordering coffee.",
+        'timestamp': datetime.utcnow()
+    } for i in range(size)]
+    # The old layout embeds every message in the session; the current one keeps a
+    # count on the session and the messages in fixed-size buckets
+    db.conversation_sessions.insert_one({
+        '_id': session_id,
+        'user_uid': 'bench',
+        'scene_id': 'bench',
+        'started_at': datetime.utcnow(),
+        'messages': messages,
+        'message_count': size,
+        'learning_points': {}
+    })
+    buckets = {}
+    for index, message in enumerate(messages):
+        seq = MessageBucket.seq_for(index)
+        bucket = buckets.setdefault(seq, MessageBucket(session_id=session_id, seq=seq))
+        bucket.messages.append(MessageBucket.make_message(index, message['role'], message['text'], message['timestamp']))
+        bucket.count += 1
+    db.message_buckets.insert_many([bucket.to_dict() for bucket in buckets.values()])
+    return session_id
+
+
+def time_reads(read, reads: int) -> float:
+    """Median latency of `reads` calls in milliseconds"""
+    samples = []
+    for _ in range(reads):
+        start = time.perf_counter()
+        read()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='10,100,1000,5000')
+    parser.add_argument('--reads', type=int, default=200)
+    parser.add_argument('--limit', type=int, default=Config.PARTNER_HISTORY_MESSAGES)
+    parser.add_argument('--mongo-uri', default=f'mongodb://localhost:27017/{BENCH_DB}',
+                        help=f'scratch database to use (name must start with {BENCH_DB_PREFIX}); it is dropped when the run finishes')
+    args = parser.parse_args()
+
+    db_name = parse_uri(args.mongo_uri).get('database') or ''
+    if not db_name.startswith(BENCH_DB_PREFIX):
+        parser.error(f"refusing to run against database '{db_name}': the benchmark drops its database, "
+                     f"so its name must start with '{BENCH_DB_PREFIX}'")
+
+    app = Flask(__name__)
+    app.config['MONGO_URI'] = args.mongo_uri
+    mongo.init_app(app)
+    db = mongo.db
+    try:
+        print(f"{'messages':>10} {'full doc (ms)':>15} {'bounded (ms)':>15}")
+        for size in [int(s) for s in args.sizes.split(',')]:
+            session_id = make_session(db, size)
+            full = time_reads(
+                lambda: db.conversation_sessions.find_one({'_id': session_id}),
+                args.reads
+            )
+            bounded = time_reads(
+                lambda: load_history(session_id, args.limit),
+                args.reads
+            )
+            print(f"{size:>10} {full:>15.3f} {bounded:>15.3f}")
+    finally:
+        mongo.cx.drop_database(db.name)
+
+
+if __name__ == '__main__':
+    main()
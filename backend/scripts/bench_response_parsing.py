@@ -0,0 +1,145 @@
+"""
+Benchmark LLM response parsing.
+
+Runs the previous regex/json.loads tutor extractor and the single-pass
+extractor in app.llm.parsing over a corpus of tutor and partner responses
+shaped like the ones the models actually return: bare JSON, JSON in code
+fences, JSON with chatter around it, and plain-text partner replies.
+
+Usage: python scripts/bench_response_parsing.py [--iterations 20000]
+"""
+import sys
+import os
+import argparse
+import json
+import re
+import timeit
+
+# Add the backend directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.llm.parsing import parse_tutor_response, parse_partner_response
+
+TUTOR_BODY = {
+    "feedback": {
+        "unfamiliar_words": ["latte", "to go"],
+        "grammar_errors": {"I wants a coffee": "I want a coffee"},
+        "wrong_expressions": {"give me coffee": "Could I have a coffee, please?"},
+        "best_fit_words": {"big": "large"}
+    },
+    "tutor_message": "你可以说：Could I have a large latte to go, please? 这样更礼貌。"
+}
+CLEAN_TUTOR_BODY = {
+    "feedback": {"unfamiliar_words": [], "grammar_errors": {}, "wrong_expressions": {}, "best_fit_words": {}},
+    "tutor_message": "说得很好！你也可以说：I'd like a cappuccino, please."
+}
+
+TUTOR_CORPUS = {
+    'bare json': json.dumps(TUTOR_BODY, ensure_ascii=False),
+    'pretty json': json.dumps(TUTOR_BODY, ensure_ascii=False, indent=4),
+    'clean turn': json.dumps(CLEAN_TUTOR_BODY, ensure_ascii=False),
+    'code fence': "```json\n" + json.dumps(TUTOR_BODY, ensure_ascii=False, indent=2) + "\n```",
+    'chatter': "Here is my feedback:\n" + json.dumps(TUTOR_BODY, ensure_ascii=False) + "\nLet me know if you have questions!",
+    'prefix': "tutor_message: 说得很好！",
+}
+
+PARTNER_CORPUS = {
+    'plain': "Sure! Would you like that hot or iced? We also have oat milk if you prefer.",
+    'json': json.dumps({"message": "Sure! Would you like that hot or iced?"}),
+    'code fence': "```json\n" + json.dumps({"message": "That'll be four fifty. Card or cash?"}) + "\n```",
+}
+
+
+def legacy_extract_tutor_feedback(response: str) -> dict:
+    """The extractor the conversation routes used before app.llm.parsing"""
+    if response.startswith("tutor_message:"):
+        message = response.replace("tutor_message:", "").strip()
+        return {
+            "feedback": json.dumps({"unfamiliar_words": [], "grammar_errors": {}, "wrong_expressions": {}, "best_fit_words": {}}),
+            "tutor_message": message,
+            "needs_correction": False
+        }
+
+    code_block_match = re.search(r'```json\s*(\{.*?\})\s*```', response, re.DOTALL)
+    if code_block_match:
+        try:
+            parsed_json = json.loads(code_block_match.group(1))
+            if 'feedback' in parsed_json:
+                return {
+                    "feedback": json.dumps(parsed_json['feedback']),
+                    "tutor_message": parsed_json['tutor_message'],
+                    "needs_correction": any([
+                        len(parsed_json['feedback'].get('unfamiliar_words', [])) > 0,
+                        len(parsed_json['feedback'].get('grammar_errors', {})) > 0,
+                        len(parsed_json['feedback'].get('wrong_expressions', {})) > 0,
+                        len(parsed_json['feedback'].get('best_fit_words', {})) > 0
+                    ])
+                }
+        except json.JSONDecodeError:
+            pass
+
+    try:
+        parsed_json = json.loads(response)
+        if 'feedback' in parsed_json:
+            return {
+                "feedback": json.dumps(parsed_json['feedback']),
+                "tutor_message": parsed_json['tutor_message'],
+                "needs_correction": any([
+                    len(parsed_json['feedback'].get('unfamiliar_words', [])) > 0,
+                    len(parsed_json['feedback'].get('grammar_errors', {})) > 0,
+                    len(parsed_json['feedback'].get('wrong_expressions', {})) > 0,
+                    len(parsed_json['feedback'].get('best_fit_words', {})) > 0
+                ])
+            }
+    except json.JSONDecodeError:
+        pass
+
+    return {
+        "feedback": json.dumps({"unfamiliar_words": [], "grammar_errors": {}, "wrong_expressions": {}, "best_fit_words": {}}),
+        "needs_correction": False
+    }
+
+
+def legacy_extract_partner_message(response: str) -> dict:
+    try:
+        parsed_json = json.loads(response)
+        if isinstance(parsed_json, dict) and 'message' in parsed_json:
+            return {"message": parsed_json['message']}
+    except json.JSONDecodeError:
+        return {"message": response.strip()}
+
+
+def per_call_us(fn, response: str, iterations: int) -> float:
+    return timeit.timeit(lambda: fn(response), number=iterations) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=20000)
+    args = parser.parse_args()
+
+    # Silence the parse-failure prints so they don't swamp the timings
+    sys.stdout, stdout = open(os.devnull, 'w'), sys.stdout
+    try:
+        rows = []
+        for name, response in TUTOR_CORPUS.items():
+            parsed = 'tutor_message' in legacy_extract_tutor_feedback(response), 'tutor_message' in parse_tutor_response(response)
+            rows.append((f"tutor/{name}", parsed,
+                         per_call_us(legacy_extract_tutor_feedback, response, args.iterations),
+                         per_call_us(parse_tutor_response, response, args.iterations)))
+        for name, response in PARTNER_CORPUS.items():
+            parsed = legacy_extract_partner_message(response) is not None, parse_partner_response(response) is not None
+            rows.append((f"partner/{name}", parsed,
+                         per_call_us(legacy_extract_partner_message, response, args.iterations),
+                         per_call_us(parse_partner_response, response, args.iterations)))
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+    print(f"{'response':<22} {'parsed (old/new)':>17} {'old (us)':>10} {'new (us)':>10}")
+    for name, (old_ok, new_ok), old, new in rows:
+        print(f"{name:<22} {str(old_ok) + '/' + str(new_ok):>17} {old:>10.2f} {new:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
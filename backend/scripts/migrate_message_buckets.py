@@ -0,0 +1,89 @@
+"""
+Move messages embedded in conversation_sessions documents into message_buckets.
+
+Run this before starting the app version that stores messages in buckets (or with
+the app stopped), so no new messages are appended while a session is migrated.
+Safe to re-run: sessions without an embedded messages array are skipped and
+buckets are written by (session_id, seq).
+
+Usage: python scripts/migrate_message_buckets.py [--dry-run]
+"""
+import sys
+import os
+import argparse
+from datetime import datetime
+
+# Add the backend directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import MongoClient, ReplaceOne, ASCENDING
+from config import Config
+from app.models.mongo_models import MessageBucket
+
+
+def bucket_messages(session_id, messages):
+    """Split a session's embedded messages into bucket documents"""
+    buckets = {}
+    for index, message in enumerate(messages):
+        seq = MessageBucket.seq_for(index)
+        bucket = buckets.setdefault(seq, MessageBucket(session_id=session_id, seq=seq))
+        bucket.messages.append(MessageBucket.make_message(
+            index, message['role'], message['text'], message.get('timestamp')
+        ))
+        bucket.count += 1
+    return list(buckets.values())
+
+
+def migrate_session(db, session, dry_run=False):
+    messages = session.get('messages') or []
+    buckets = bucket_messages(session['_id'], messages)
+
+    update = {
+        '$set': {'message_count': len(messages)},
+        '$unset': {'messages': ''}
+    }
+    # Summaries written before migration may count messages differently; rebuild them
+    if session.get('message_count') != len(messages):
+        update['$set'].update({'summary': None, 'summarized_count': 0})
+
+    if dry_run:
+        return len(buckets)
+
+    if buckets:
+        db.message_buckets.bulk_write([
+            ReplaceOne(
+                {'session_id': bucket.session_id, 'seq': bucket.seq},
+                {k: v for k, v in bucket.to_dict().items() if k != '_id'},
+                upsert=True
+            ) for bucket in buckets
+        ], ordered=False)
+    db.conversation_sessions.update_one({'_id': session['_id']}, update)
+    return len(buckets)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dry-run', action='store_true', help='report what would be migrated without writing')
+    args = parser.parse_args()
+
+    client = MongoClient(Config.MONGO_URI)
+    db = client.get_default_database(Config.MONGO_DBNAME)
+    db.message_buckets.create_index([('session_id', ASCENDING), ('seq', ASCENDING)], unique=True)
+
+    sessions = db.conversation_sessions.find({'messages': {'$exists': True}})
+    migrated = 0
+    total_buckets = 0
+    started = datetime.utcnow()
+    for session in sessions:
+        total_buckets += migrate_session(db, session, dry_run=args.dry_run)
+        migrated += 1
+        if migrated % 100 == 0:
+            print(f"Migrated {migrated} sessions...", flush=True)
+
+    action = "Would migrate" if args.dry_run else "Migrated"
+    print(f"{action} {migrated} sessions into {total_buckets} buckets "
+          f"in {(datetime.utcnow() - started).total_seconds():.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Pre-render opening remarks audio for every scene level.
+
+Walks scene_levels with an opening_remarks_text, renders each text through the TTS
+backend (TTS_BACKEND, or --backend stub for offline runs) on a bounded worker pool
+and records the file as the level's opening_remarks_audio_path. Files are named by a
+hash of what was rendered (backend, model, voice, format and text), so levels with
+unchanged text are skipped and identical texts share one file. Bumps the catalog
+version if anything changed, so the audio endpoint picks up the new files.
+
+Usage: python scripts/render_opening_remarks.py [--backend NAME] [--voice VOICE] [--workers N]
+                                                [--level B1] [--limit N] [--force] [--dry-run]
+"""
+import sys
+import os
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Add the backend directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from config import Config
+from app.extensions import mongo
+from app.audio import APP_DIR, AUDIO_DIR
+from app.catalog import catalog_version
+from app.tts import create_tts_backend, normalize_speech_text, write_atomic
+
+AUDIO_FORMAT = 'mp3'
+
+
+def needs_render(level: dict, key: str, force: bool) -> bool:
+    if force or level.get('opening_remarks_text_hash') != key:
+        return True
+    path = level.get('opening_remarks_audio_path')
+    return not path or not os.path.exists(os.path.join(APP_DIR, path))
+
+
+def render_level(db, backend, level: dict, key: str, voice: str, file_locks: dict, locks_guard: threading.Lock):
+    filename = f"{key}.{AUDIO_FORMAT}"
+    path = os.path.join(AUDIO_DIR, filename)
+    # Levels sharing a text share a file; render it once
+    with locks_guard:
+        file_lock = file_locks.setdefault(key, threading.Lock())
+    with file_lock:
+        if not os.path.exists(path):
+            write_atomic(path, backend.synthesize(normalize_speech_text(level['opening_remarks_text']), voice, AUDIO_FORMAT))
+
+    db.scene_levels.update_one({'_id': level['_id']}, {'$set': {
+        'opening_remarks_audio_path': os.path.relpath(path, APP_DIR),
+        'opening_remarks_text_hash': key
+    }})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backend', help='TTS backend (default TTS_BACKEND)')
+    parser.add_argument('--voice', default=Config.TTS_VOICE, help='voice to render with (default TTS_VOICE)')
+    parser.add_argument('--workers', type=int, default=Config.TTS_RENDER_WORKERS, help='concurrent TTS requests')
+    parser.add_argument('--level', help='only render this English level')
+    parser.add_argument('--limit', type=int, help='render at most this many levels')
+    parser.add_argument('--force', action='store_true', help='re-render levels whose text has not changed')
+    parser.add_argument('--dry-run', action='store_true', help='list levels that need rendering without rendering them')
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.config['MONGO_URI'] = Config.MONGO_URI
+    mongo.init_app(app)
+    backend = create_tts_backend(args.backend)
+    os.makedirs(AUDIO_DIR, exist_ok=True)
+
+    with app.app_context():
+        db = mongo.db
+        query = {'opening_remarks_text': {'$nin': [None, '']}}
+        if args.level:
+            query['english_level'] = args.level.upper()
+        projection = {'opening_remarks_text': 1, 'opening_remarks_audio_path': 1, 'opening_remarks_text_hash': 1}
+
+        pending = []
+        for level in db.scene_levels.find(query, projection):
+            key = backend.audio_key(level['opening_remarks_text'], args.voice, AUDIO_FORMAT)
+            if needs_render(level, key, args.force):
+                pending.append((level, key))
+                if args.limit and len(pending) >= args.limit:
+                    break
+
+        if args.dry_run:
+            for level, key in pending:
+                print(f"Would render scene level {level['_id']} -> {key}.{AUDIO_FORMAT}")
+            print(f"{len(pending)} scene levels need rendering")
+            return
+
+        started = time.monotonic()
+        file_locks, locks_guard = {}, threading.Lock()
+        rendered = failed = 0
+        with ThreadPoolExecutor(max_workers=max(1, args.workers), thread_name_prefix='tts-render') as executor:
+            futures = {
+                executor.submit(render_level, db, backend, level, key, args.voice, file_locks, locks_guard): level
+                for level, key in pending
+            }
+            for future, level in futures.items():
+                try:
+                    future.result()
+                    rendered += 1
+                except Exception as e:
+                    failed += 1
+                    print(f"Failed to render scene level {level['_id']}: {str(e)}", flush=True)
+
+        if rendered:
+            catalog_version.bump()
+        print(f"Rendered {rendered} scene levels ({failed} failed) in {time.monotonic() - started:.1f}s")
+        if failed:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()